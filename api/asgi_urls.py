@@ -0,0 +1,18 @@
+"""
+URL configuration used under an ASGI server (see SHOP_ASGI_URLCONF): the
+public catalog endpoints are served by their async variants and every
+other route falls through to the regular URL configuration.
+"""
+from django.urls import path
+
+from shop import async_views
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/init-app-data/', async_views.init_app_data_view, name='init-app-data'),
+    path('api/public/products/', async_views.public_product_list_view, name='public-products'),
+    path('api/public/boutiques/', async_views.public_boutique_list_view, name='public-boutiques'),
+    path('api/public/sliders/', async_views.public_slider_list_view, name='public-sliders'),
+    path('api/public/config/', async_views.public_config_view, name='public-config'),
+] + wsgi_urlpatterns
@@ -33,6 +33,7 @@ ALLOWED_HOSTS = ["*"]
 
 INSTALLED_APPS = [
     'unfold',
+    'unfold.contrib.filters',
     'corsheaders',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -49,6 +50,10 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'shop.VendorUser'
 
 MIDDLEWARE = [
+    # First, so it times the whole stack
+    'shop.middleware.MetricsMiddleware',
+    'shop.middleware.CompressionMiddleware',
+    'shop.middleware.AsgiUrlconfMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,9 +62,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so the database routing covers the view only (see shop.routers)
+    'shop.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'api.urls'
+# URL configuration used when served by an ASGI server, with async variants
+# of the public catalog endpoints
+SHOP_ASGI_URLCONF = 'api.asgi_urls'
 
 TEMPLATES = [
     {
@@ -87,9 +97,59 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests instead of reopening the file
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Seconds to wait for the write lock before raising "database is locked"
+            'timeout': 20,
+        },
     }
 }
 
+# Read replicas for public catalog reads. Locally a periodically refreshed
+# copy of the SQLite file works (`manage.py snapshot_replica`), e.g.
+#
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': BASE_DIR / 'db-replica.sqlite3',
+#     'CONN_MAX_AGE': 600,
+# }
+# SHOP_READ_REPLICAS = ['replica']
+#
+# and a Postgres streaming replica in production.
+DATABASE_ROUTERS = ['shop.routers.ReadReplicaRouter']
+SHOP_READ_REPLICAS = []
+# URL names whose GET requests may be served from a replica
+SHOP_REPLICA_ROUTES = (
+    'public-products',
+    'public-products-search',
+    'public-products-export',
+    'public-boutiques',
+    'public-sliders',
+    'public-config',
+    'init-app-data',
+)
+# Seconds a client stays on the primary after a write, so it reads its own
+# writes. Replica lag is not measured: replicas must keep it below this
+# (snapshot_replica runs more often than that, or streaming replication)
+SHOP_PRIMARY_PIN_SECONDS = 5
+
+# Pragmas applied to every SQLite connection (see shop/db.py)
+SHOP_SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+# WAL lets readers proceed while a vendor write is in flight. Unlike the
+# other pragmas it is stored in the database file itself, so it is only
+# enabled with SHOP_SQLITE_WAL=1 (deployments) and the checked-in
+# development database is left untouched.
+if os.environ.get('SHOP_SQLITE_WAL') == '1':
+    SHOP_SQLITE_PRAGMAS['journal_mode'] = 'WAL'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -126,7 +186,7 @@ USE_TZ = True
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'shop.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Changed back to allow any by default
@@ -136,6 +196,83 @@ REST_FRAMEWORK = {
 }
 
 
+# Caches
+# The catalog cache is file based so every worker sees the same catalog
+# version and shares the pre-serialized snapshots.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'catalog',
+    },
+    # Use LocMemCache instead when a single worker process serves the site
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'sessions',
+        'TIMEOUT': None,
+    },
+}
+
+# Sessions are served from the cache and written behind to django_session,
+# keeping vendor logins off the SQLite write lock. Run
+# `manage.py clearsessions` periodically to purge expired rows.
+SESSION_ENGINE = 'shop.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+# Seconds between two batches of session writes to the database
+SHOP_SESSION_WRITE_BEHIND_INTERVAL = 2
+
+# Cache alias used for the catalog version and init-app-data snapshots
+SHOP_CATALOG_CACHE = 'catalog'
+# Lifetime of a snapshot in seconds (None keeps it until the version changes)
+SHOP_CATALOG_SNAPSHOT_TIMEOUT = None
+# Delta sync cursors overlap by this many seconds to cover in-flight writes
+SHOP_SYNC_OVERLAP_SECONDS = 5
+# Number of products serialized per chunk by the streaming catalog export
+SHOP_EXPORT_CHUNK_SIZE = 500
+# Image renditions are rendered in a process pool of this size after upload
+SHOP_IMAGE_WORKERS = 2
+SHOP_IMAGE_DERIVATIVES_ASYNC = True
+# Per-process cache of authenticated API tokens
+SHOP_TOKEN_CACHE_SIZE = 1024
+SHOP_TOKEN_CACHE_TTL = 60
+# Seconds before an unconfirmed stock reservation is released
+SHOP_RESERVATION_TTL = 15 * 60
+# Limits of a cart sent to /api/public/quote/ and /api/public/reserve/
+SHOP_CART_MAX_ITEMS = 100
+SHOP_CART_MAX_QUANTITY = 10000
+# Maximum number of operations accepted by /api/products/bulk/
+SHOP_BULK_MAX_ITEMS = 1000
+
+# Unfiltered admin changelists of larger tables show an estimated row count
+SHOP_ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Text and JSON responses from SHOP_COMPRESSION_MIN_SIZE bytes are compressed
+# (brotli when the package is installed, gzip otherwise). Bodies of these
+# routes from SHOP_COMPRESSION_CACHE_MIN_SIZE bytes are compressed once per
+# catalog version and kept in the catalog cache.
+SHOP_COMPRESSION_MIN_SIZE = 200
+SHOP_COMPRESSION_CACHE_MIN_SIZE = 8192
+SHOP_COMPRESSION_CACHE_TIMEOUT = 3600
+SHOP_COMPRESSION_CACHED_ROUTES = (
+    'init-app-data',
+    'public-products',
+    'public-products-search',
+    'public-boutiques',
+    'public-sliders',
+    'public-config',
+)
+
+# Every worker writes its request metrics here every
+# SHOP_METRICS_FLUSH_INTERVAL seconds; /api/metrics/ adds them up and
+# deletes the files not refreshed for SHOP_METRICS_RETENTION_INTERVALS
+# intervals (one hour), left by workers that exited
+SHOP_METRICS_DIR = BASE_DIR / 'cache' / 'metrics'
+SHOP_METRICS_FLUSH_INTERVAL = 10
+SHOP_METRICS_RETENTION_INTERVALS = 360
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
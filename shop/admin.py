@@ -1,10 +1,98 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import lookup_spawns_duplicates
 from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
 from unfold.admin import ModelAdmin
+from unfold.contrib.filters.admin import AutocompleteSelectFilter
 from unfold.forms import UserCreationForm, UserChangeForm
+from unfold.views import ChangeList
+from .search import search_products
 from .models import CompanyConfig, Boutique, Slider, Product, Category, VendorUser
 
 
+def estimate_row_count(model, using):
+    """
+    Cheap estimate of a table's row count, or None when the database has
+    no way to get one without scanning the table
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        elif connection.vendor == 'sqlite':
+            # Rowids are allocated in order, so the largest one is read from
+            # the end of the b-tree; deleted rows make it an overestimate
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that does not run ``COUNT(*)`` over a whole large table: the
+    unfiltered changelist uses an estimate once the table holds more than
+    SHOP_ADMIN_ESTIMATED_COUNT_THRESHOLD rows. Filtered and searched lists
+    keep exact counts.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > getattr(settings, 'SHOP_ADMIN_ESTIMATED_COUNT_THRESHOLD', 10000):
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(ModelAdmin):
+    """
+    Changelist settings for tables that grow with the catalog: estimated
+    page counts, no extra unfiltered ``COUNT(*)``, and filters that take
+    the related row through autocomplete instead of listing every row
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_filter_submit = True
+
+
+class CategoryFilter(AutocompleteSelectFilter):
+    """
+    Category filter of the product changelist. Filtering through the link
+    table in a subquery cannot return a product twice, so the changelist
+    does not wrap the query in a correlated EXISTS scanning every product.
+    """
+    def queryset(self, request, queryset):
+        links = Product.categories.through.objects.values('product_id')
+        try:
+            if self.value() not in (None, ''):
+                return queryset.filter(pk__in=links.filter(category_id=self.value()))
+            if self.lookup_val_isnull in ('True', 'true', '1'):
+                return queryset.exclude(pk__in=links)
+            if self.lookup_val_isnull in ('False', 'false', '0'):
+                return queryset.filter(pk__in=links)
+        except (ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+        return queryset
+
+
+class ProductChangeList(ChangeList):
+    def get_filters(self, request):
+        filter_specs, has_filters, remaining, may_have_duplicates, has_active_filters = super().get_filters(request)
+        # CategoryFilter never duplicates rows; only lookups left in the
+        # query string may still join the categories
+        may_have_duplicates = any(lookup_spawns_duplicates(self.lookup_opts, key) for key in remaining)
+        return filter_specs, has_filters, remaining, may_have_duplicates, has_active_filters
+
+
 @admin.register(VendorUser)
 class VendorUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'is_active', 'date_joined')
@@ -52,15 +140,16 @@ class CompanyConfigAdmin(ModelAdmin):
 
 
 @admin.register(Boutique)
-class BoutiqueAdmin(ModelAdmin):
-    list_display = ('name', 'owner_username', 'get_products_count', 'created_at')
+class BoutiqueAdmin(LargeTableAdmin):
+    list_display = ('name', 'owner_username', 'product_count', 'created_at')
+    list_select_related = ('owner',)
     list_filter = ('created_at', 'updated_at')
     search_fields = ('name', 'description', 'owner__username')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('product_count', 'created_at', 'updated_at')
     autocomplete_fields = ['owner']
     fieldsets = (
         ('Informations générales', {
-            'fields': ('name', 'image', 'description', 'owner')
+            'fields': ('name', 'image', 'description', 'owner', 'product_count')
         }),
         ('Dates', {
             'fields': ('created_at', 'updated_at'),
@@ -71,32 +160,25 @@ class BoutiqueAdmin(ModelAdmin):
     def owner_username(self, obj):
         return obj.owner.username if obj.owner else "Aucun propriétaire"
     owner_username.short_description = "Propriétaire"
-    
-    def get_products_count(self, obj):
-        return obj.products.count()
-    get_products_count.short_description = "Nombre de produits"
 
 
 @admin.register(Category)
-class CategoryAdmin(ModelAdmin):
-    list_display = ('name', 'boutique', 'get_products_count', 'created_at')
-    list_filter = ('boutique', 'created_at', 'updated_at')
+class CategoryAdmin(LargeTableAdmin):
+    list_display = ('name', 'boutique', 'product_count', 'created_at')
+    list_select_related = ('boutique',)
+    list_filter = (('boutique', AutocompleteSelectFilter), 'created_at', 'updated_at')
     search_fields = ('name', 'description', 'boutique__name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('product_count', 'created_at', 'updated_at')
     autocomplete_fields = ['boutique']
     fieldsets = (
         ('Informations générales', {
-            'fields': ('name', 'description', 'boutique')
+            'fields': ('name', 'description', 'boutique', 'product_count')
         }),
         ('Dates', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
-    
-    def get_products_count(self, obj):
-        return obj.products.count()
-    get_products_count.short_description = "Nombre de produits"
 
 
 @admin.register(Slider)
@@ -121,9 +203,15 @@ class SliderAdmin(ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     list_display = ('title', 'price', 'stock', 'boutique', 'get_categories', 'created_at')
-    list_filter = ('boutique', 'categories', 'created_at', 'updated_at')
+    list_select_related = ('boutique',)
+    list_filter = (
+        ('boutique', AutocompleteSelectFilter),
+        ('categories', CategoryFilter),
+        'created_at',
+        'updated_at',
+    )
     search_fields = ('title', 'description', 'boutique__name')
     readonly_fields = ('created_at', 'updated_at')
     autocomplete_fields = ['boutique', 'categories']
@@ -140,6 +228,21 @@ class ProductAdmin(ModelAdmin):
         }),
     )
     
+    def get_changelist(self, request, **kwargs):
+        return ProductChangeList
+
+    def get_queryset(self, request):
+        # Prefetching runs on the displayed page only
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('categories', queryset=Category.objects.only('id', 'name'))
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of LIKE scans over every product
+        if not search_term:
+            return queryset, False
+        return search_products(queryset, search_term), False
+
     def get_categories(self, obj):
         return ", ".join([category.name for category in obj.categories.all()])
     get_categories.short_description = "Catégories"
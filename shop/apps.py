@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop'
+
+    def ready(self):
+        # Register catalog invalidation signal handlers, the SQLite
+        # connection setup and the query recorder of the request metrics
+        from . import db, metrics, signals  # noqa: F401
@@ -0,0 +1,114 @@
+"""
+Async variants of the public catalog endpoints, served under an ASGI server
+(see AsgiUrlconfMiddleware and api/asgi_urls.py), so a worker no longer
+holds a thread while slow mobile clients are served. Responses match the
+sync views'.
+
+Sliders and the company config go through Django's async ORM. The product
+and boutique lists rely on DRF filtering, cursor pagination and
+prefetch_related, which are sync only: their page is built by
+``list_page`` in the database thread, through ``sync_to_async``.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified
+from rest_framework.exceptions import APIException
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import views
+from .cache import etag_matches, get_init_app_data_snapshot
+from .filters import get_product_facets, parse_product_filters
+from .middleware import should_use_replica
+from .models import CompanyConfig, Slider
+from .routers import use_replica
+from .serializers import CompanyConfigSerializer, FieldSelection, SliderSerializer, plan_queryset
+
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def exception_response(exc):
+    """
+    Response of DRF's default exception handler for ``exc``, so invalid
+    filters, cursors and pages get the same status and body as the sync views
+    """
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return json_response(data, status=exc.status_code)
+
+
+def async_public_view(view):
+    """
+    GET only, with reads routed like the sync public views
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        try:
+            with use_replica(should_use_replica(request)):
+                return await view(request, *args, **kwargs)
+        except APIException as exc:
+            return exception_response(exc)
+    return wrapper
+
+
+def list_page(view_class, request):
+    """
+    Filter, paginate and serialize one page like ``view_class`` does; meant
+    to run in the database thread through ``sync_to_async``
+    """
+    view = view_class()
+    view.request = Request(request)
+    view.format_kwarg = None
+    view.args, view.kwargs = (), {}
+    queryset = view.filter_queryset(view.get_queryset())
+    page = view.paginate_queryset(queryset)
+    return view.get_paginated_response(view.get_serializer(page, many=True).data).data
+
+
+@async_public_view
+async def init_app_data_view(request):
+    snapshot = await sync_to_async(get_init_app_data_snapshot)()
+
+    if etag_matches(request, snapshot['etag']):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot['body'], content_type='application/json')
+    response['ETag'] = snapshot['etag']
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@async_public_view
+async def public_product_list_view(request):
+    data = await sync_to_async(list_page)(views.PublicProductListView, request)
+    data['facets'] = await sync_to_async(get_product_facets)(parse_product_filters(request.GET))
+    return json_response(data)
+
+
+@async_public_view
+async def public_boutique_list_view(request):
+    return json_response(await sync_to_async(list_page)(views.PublicBoutiqueListView, request))
+
+
+@async_public_view
+async def public_slider_list_view(request):
+    drf_request = Request(request)
+    paginator = PageNumberPagination()
+    queryset = plan_queryset(Slider.objects.all(), SliderSerializer, FieldSelection.from_request(drf_request))
+    sliders = [slider async for slider in queryset]
+    page = paginator.paginate_queryset(sliders, drf_request)
+    serializer = SliderSerializer(page, many=True, context={'request': drf_request})
+    return json_response(paginator.get_paginated_response(serializer.data).data)
+
+
+@async_public_view
+async def public_config_view(request):
+    drf_request = Request(request)
+    queryset = plan_queryset(CompanyConfig.objects.all(), CompanyConfigSerializer, FieldSelection.from_request(drf_request))
+    config = await queryset.afirst()
+    return json_response(CompanyConfigSerializer(config, context={'request': drf_request}).data)
@@ -0,0 +1,111 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .models import Boutique
+
+
+class TokenCache:
+    """
+    In-process LRU cache of authenticated tokens with a time to live
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in [key for key, (_, (user, _)) in self._entries.items() if user.pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'SHOP_TOKEN_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'SHOP_TOKEN_CACHE_TTL', 60),
+)
+
+_UNSET = object()
+
+
+def get_boutique_id(user):
+    """
+    Return the id of the boutique owned by ``user`` (or None), looked up at
+    most once per user object
+    """
+    boutique_id = getattr(user, '_boutique_id', _UNSET)
+    if boutique_id is _UNSET:
+        boutique_id = Boutique.objects.filter(owner_id=user.pk).values_list('id', flat=True).first()
+        user._boutique_id = boutique_id
+    return boutique_id
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication resolving tokens through an in-process LRU+TTL
+    cache. The user carries its boutique id, so ownership checks need no
+    extra query.
+    """
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user', 'user__boutique').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+            user = token.user
+            try:
+                user._boutique_id = user.boutique.pk
+            except Boutique.DoesNotExist:
+                user._boutique_id = None
+            cached = (user, token)
+            token_cache.set(key, cached)
+
+        user, token = cached
+        # Each request gets its own copy so views can't alter the cached user
+        return copy.copy(user), token
+
+
+def invalidate_token(key):
+    token_cache.delete(key)
+
+
+def invalidate_user_tokens(user_id):
+    token_cache.delete_user(user_id)
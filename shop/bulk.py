@@ -0,0 +1,141 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .counters import adjust_product_counts
+from .images import schedule_derivatives
+from .models import Boutique, Category, Product
+from .serializers import ProductBulkWriteSerializer
+
+
+PRODUCT_FIELDS = ('title', 'description', 'price', 'stock', 'image')
+
+
+class ProductBulkWriter:
+    """
+    Apply many product creates, partial updates and deletes for one
+    boutique. Everything is validated first (category ids against the
+    boutique's categories in a single query); if any item is invalid
+    nothing is written, otherwise the whole batch is applied with
+    ``bulk_create``/``bulk_update`` in one transaction.
+    """
+    def __init__(self, boutique_id):
+        self.boutique_id = boutique_id
+
+    def validate(self, create, update, delete):
+        results = []
+        valid_creates, valid_updates = [], []
+
+        for index, item in enumerate(create):
+            serializer = ProductBulkWriteSerializer(data=item)
+            if serializer.is_valid():
+                valid_creates.append((index, serializer.validated_data))
+            else:
+                results.append({'op': 'create', 'index': index, 'errors': serializer.errors})
+
+        # A product may appear in a single update or delete
+        seen = set()
+        for index, item in enumerate(update):
+            serializer = ProductBulkWriteSerializer(data=item, partial=True)
+            if not serializer.is_valid():
+                results.append({'op': 'update', 'index': index, 'errors': serializer.errors})
+            elif 'id' not in serializer.validated_data:
+                results.append({'op': 'update', 'index': index, 'errors': {'id': ['Ce champ est obligatoire.']}})
+            elif serializer.validated_data['id'] in seen:
+                results.append({'op': 'update', 'index': index, 'errors': {'id': ['Produit déjà présent dans la requête.']}})
+            else:
+                seen.add(serializer.validated_data['id'])
+                valid_updates.append((index, serializer.validated_data))
+        for index, pk in enumerate(delete):
+            if pk in seen:
+                results.append({'op': 'delete', 'index': index, 'errors': {'id': ['Produit déjà présent dans la requête.']}})
+            seen.add(pk)
+
+        # One query for every category referenced by the request
+        category_ids = {pk for _, data in valid_creates + valid_updates for pk in data.get('category_ids', ())}
+        allowed = set(
+            Category.objects.filter(boutique_id=self.boutique_id, pk__in=category_ids).values_list('id', flat=True)
+        ) if category_ids else set()
+        for op, items in (('create', valid_creates), ('update', valid_updates)):
+            for index, data in items:
+                unknown = sorted(set(data.get('category_ids', ())) - allowed)
+                if unknown:
+                    results.append({'op': op, 'index': index, 'errors': {'category_ids': [f'Catégories inconnues : {unknown}']}})
+
+        # One query for every product updated or deleted
+        product_ids = {data['id'] for _, data in valid_updates} | set(delete)
+        self.products = Product.objects.filter(boutique_id=self.boutique_id).in_bulk(list(product_ids))
+        for index, data in valid_updates:
+            if data['id'] not in self.products:
+                results.append({'op': 'update', 'index': index, 'errors': {'id': ['Produit introuvable.']}})
+        for index, pk in enumerate(delete):
+            if pk not in self.products:
+                results.append({'op': 'delete', 'index': index, 'errors': {'id': ['Produit introuvable.']}})
+
+        self.creates, self.updates, self.deletes = valid_creates, valid_updates, delete
+        return results
+
+    def apply(self):
+        now = timezone.now()
+        results = []
+        Through = Product.categories.through
+
+        with transaction.atomic():
+            created = Product.objects.bulk_create([
+                Product(boutique_id=self.boutique_id, **{
+                    field: data.get(field, '') for field in PRODUCT_FIELDS
+                })
+                for _, data in self.creates
+            ])
+
+            changed_fields = {'updated_at'}
+            updated = []
+            for _, data in self.updates:
+                product = self.products[data['id']]
+                for field in PRODUCT_FIELDS:
+                    if field in data:
+                        setattr(product, field, data[field])
+                        changed_fields.add(field)
+                product.updated_at = now
+                updated.append(product)
+            if updated:
+                Product.objects.bulk_update(updated, sorted(changed_fields))
+
+            # Replace category links of updated products that sent category_ids
+            relinked = [data['id'] for _, data in self.updates if 'category_ids' in data]
+            category_counts = Counter()
+            if relinked:
+                old_links = Through.objects.filter(product_id__in=relinked)
+                category_counts.subtract(old_links.values_list('category_id', flat=True))
+                old_links.delete()
+            pairs = {
+                (product.pk, category_id)
+                for product, (_, data) in zip(created, self.creates)
+                for category_id in data.get('category_ids', ())
+            } | {
+                (data['id'], category_id)
+                for _, data in self.updates if 'category_ids' in data
+                for category_id in data['category_ids']
+            }
+            links = [Through(product_id=product_id, category_id=category_id) for product_id, category_id in sorted(pairs)]
+            Through.objects.bulk_create(links)
+            # bulk_create sends no signals, so maintain the counters here
+            category_counts.update(link.category_id for link in links)
+            adjust_product_counts(Category, category_counts)
+            adjust_product_counts(Boutique, {self.boutique_id: len(created)})
+
+            if self.deletes:
+                # Regular delete so tombstones are recorded for delta sync
+                Product.objects.filter(boutique_id=self.boutique_id, pk__in=self.deletes).delete()
+
+            transaction.on_commit(bump_catalog_version)
+
+        for product in created + updated:
+            schedule_derivatives(product.image)
+
+        results += [{'op': 'create', 'index': index, 'id': product.pk} for (index, _), product in zip(self.creates, created)]
+        results += [{'op': 'update', 'index': index, 'id': data['id']} for index, data in self.updates]
+        results += [{'op': 'delete', 'index': index, 'id': pk} for index, pk in enumerate(self.deletes)]
+        return results
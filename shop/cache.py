@@ -0,0 +1,111 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .routers import use_primary
+
+
+CATALOG_VERSION_KEY = 'shop:catalog-version'
+SNAPSHOT_KEY = 'shop:init-app-data:{version}'
+
+
+def get_catalog_cache():
+    """
+    Return the cache holding the catalog version and snapshots
+    """
+    return caches[getattr(settings, 'SHOP_CATALOG_CACHE', 'default')]
+
+
+def _fresh_version():
+    # Time based so that a version lost to eviction never reuses an old number
+    return time.time_ns() // 1000
+
+
+def get_catalog_version():
+    """
+    Return the current catalog version, initialising it if needed
+    """
+    cache = get_catalog_cache()
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, _fresh_version(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog representation by moving to a new version
+    """
+    cache = get_catalog_cache()
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        version = _fresh_version()
+        cache.set(CATALOG_VERSION_KEY, version, timeout=None)
+        return version
+
+
+def build_init_app_data():
+    """
+    Serialize the full catalog returned by the init-app-data endpoint
+    """
+    from .models import CompanyConfig, Boutique, Slider, Product
+    from .serializers import (
+        CompanyConfigSerializer, BoutiqueSerializer, SliderSerializer, ProductSerializer,
+        plan_queryset,
+    )
+
+    # Get company config (assuming there's only one for now)
+    company_config = CompanyConfig.objects.first()
+
+    return {
+        'company_config': CompanyConfigSerializer(company_config).data if company_config else None,
+        'sliders': SliderSerializer(Slider.objects.all(), many=True).data,
+        'boutiques': BoutiqueSerializer(
+            plan_queryset(Boutique.objects.all(), BoutiqueSerializer), many=True
+        ).data,
+        'products': ProductSerializer(
+            plan_queryset(Product.objects.all(), ProductSerializer), many=True
+        ).data,
+    }
+
+
+def get_init_app_data_snapshot():
+    """
+    Return the pre-serialized init-app-data snapshot as a dict with
+    ``version``, ``etag`` and ``body`` (JSON bytes), building it on a miss
+    """
+    cache = get_catalog_cache()
+    version = get_catalog_version()
+    key = SNAPSHOT_KEY.format(version=version)
+
+    snapshot = cache.get(key)
+    if snapshot is None:
+        # Build from the primary: a lagging replica must not be cached under
+        # the new version
+        with use_primary():
+            body = JSONRenderer().render(build_init_app_data())
+        snapshot = {
+            'version': version,
+            'etag': '"%s"' % hashlib.sha1(body).hexdigest(),
+            'body': body,
+        }
+        cache.set(key, snapshot, timeout=getattr(settings, 'SHOP_CATALOG_SNAPSHOT_TIMEOUT', None))
+    return snapshot
+
+
+def etag_matches(request, etag):
+    """
+    Check whether the request's If-None-Match header covers ``etag``
+    """
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    # Weak comparison: compressed responses carry the weak form of the ETag
+    etags = [value.removeprefix('W/') for value in parse_etags(header)]
+    return '*' in etags or etag.removeprefix('W/') in etags
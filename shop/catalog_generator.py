@@ -0,0 +1,181 @@
+import math
+import random
+from collections import Counter
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from .cache import bump_catalog_version
+from .counters import adjust_product_counts
+from .models import Boutique, Category, Product, VendorUser
+
+
+BATCH_SIZE = 5000
+
+FIRST_NAMES = (
+    'Awa', 'Fatou', 'Mariam', 'Aminata', 'Kadiatou', 'Adjoa', 'Chantal', 'Brigitte', 'Nadège', 'Sylvie',
+    'Moussa', 'Ibrahim', 'Koffi', 'Yao', 'Serge', 'Didier', 'Jean-Marc', 'Olivier', 'Patrice', 'Théodore',
+)
+BOUTIQUE_PATTERNS = (
+    'Chez {name}', 'La Boutique de {name}', "L'Atelier de {name}", '{name} Mode', 'Les Délices de {name}',
+    'Maison {name}', '{name} Beauté', 'Le Comptoir de {name}', '{name} & Fils', 'Espace {name}',
+)
+BOUTIQUE_TAGLINES = (
+    'Des produits de qualité à petits prix.',
+    'Livraison rapide dans toute la ville.',
+    'Commandez directement sur WhatsApp.',
+    'Le meilleur du fait main, depuis 2015.',
+    'Arrivages chaque semaine, stocks limités.',
+)
+# Category name -> (product nouns, price median, price spread)
+CATEGORIES = {
+    'Vêtements': (('Robe', 'Chemise', 'Pagne', 'Boubou', 'Jupe', 'Pantalon', 'Veste'), 12000, 0.6),
+    'Chaussures': (('Sandales', 'Baskets', 'Escarpins', 'Mocassins', 'Babouches'), 15000, 0.5),
+    'Accessoires': (('Sac', 'Ceinture', 'Foulard', 'Chapeau', 'Portefeuille'), 7000, 0.7),
+    'Bijoux': (('Collier', 'Bracelet', "Boucles d'oreilles", 'Bague', 'Parure'), 9000, 0.9),
+    'Beauté': (('Crème', 'Savon', 'Huile', 'Parfum', 'Beurre de karité', 'Shampooing'), 4000, 0.6),
+    'Épicerie': (('Café', 'Miel', 'Piment', 'Riz', 'Attiéké', 'Jus de bissap', 'Confiture'), 2500, 0.5),
+    'Maison': (('Coussin', 'Nappe', 'Panier', 'Vase', 'Lampe', 'Tapis'), 18000, 0.8),
+    'Électronique': (('Écouteurs', 'Chargeur', 'Enceinte', 'Montre connectée', 'Power bank'), 25000, 0.9),
+    'Enfants': (('Body', 'Jouet', 'Cartable', 'Pyjama', 'Doudou'), 6000, 0.6),
+    'Artisanat': (('Statuette', 'Masque', 'Tableau', 'Tabouret', 'Calebasse'), 20000, 1.0),
+}
+QUALIFIERS = (
+    'en wax', 'en coton', 'en cuir', 'en bogolan', 'en kente', 'artisanal', 'bio', 'premium', 'classique',
+    'fait main', 'de luxe', 'traditionnel', 'moderne', 'édition limitée',
+)
+COLOURS = ('bleu', 'rouge', 'noir', 'blanc', 'vert', 'jaune', 'orange', 'doré', 'beige', 'multicolore')
+DESCRIPTIONS = (
+    '{title} de qualité supérieure, idéal pour toutes les occasions.',
+    '{title} sélectionné avec soin par notre boutique. Quantités limitées.',
+    '{title}, fabrication locale. Livraison possible le jour même.',
+    'Découvrez notre {title_lower}, un best-seller apprécié de nos clients.',
+    '{title} disponible en plusieurs tailles. Contactez-nous pour plus de détails.',
+)
+
+
+class CatalogGenerator:
+    """
+    Fill the database with a synthetic catalog: ``vendors`` vendor accounts
+    each owning a boutique with ``categories`` categories and
+    ``products_per_vendor`` products. Text is French and prices follow a
+    log-normal distribution per category, so filters, facets, search and
+    pagination see realistic data. Deterministic for a given ``seed``.
+    """
+    def __init__(self, vendors, products_per_vendor, categories, seed=0, password=None, prefix='vendeur'):
+        self.vendors = vendors
+        self.products_per_vendor = products_per_vendor
+        self.categories = categories
+        self.rng = random.Random(seed)
+        self.password = password
+        self.prefix = f'{prefix}{seed}-'
+
+    def usernames(self):
+        return [f'{self.prefix}{n}' for n in range(self.vendors)]
+
+    def price(self, median, spread):
+        value = self.rng.lognormvariate(math.log(median), spread)
+        # Shops price in round amounts
+        step = 50 if value < 5000 else 500
+        return Decimal(max(step, round(value / step) * step))
+
+    def product(self, boutique, category_name):
+        nouns, median, spread = CATEGORIES[category_name]
+        title = f'{self.rng.choice(nouns)} {self.rng.choice(QUALIFIERS)} {self.rng.choice(COLOURS)}'
+        description = self.rng.choice(DESCRIPTIONS).format(title=title, title_lower=title.lower())
+        return Product(
+            title=title,
+            description=description,
+            price=self.price(median, spread),
+            image='product_images/default.jpg',
+            # Mostly in stock, some sold out
+            stock=0 if self.rng.random() < 0.08 else int(self.rng.expovariate(1 / 40)) + 1,
+            boutique=boutique,
+        )
+
+    def create_vendors(self):
+        password = make_password(self.password)
+        users = VendorUser.objects.bulk_create(
+            [VendorUser(username=username, password=password) for username in self.usernames()],
+            batch_size=BATCH_SIZE,
+        )
+        boutiques = []
+        for user in users:
+            name = self.rng.choice(BOUTIQUE_PATTERNS).format(name=self.rng.choice(FIRST_NAMES))
+            boutiques.append(Boutique(
+                name=name,
+                description=f'{name}. {self.rng.choice(BOUTIQUE_TAGLINES)}',
+                image='boutique_images/default.jpg',
+                owner=user,
+            ))
+        return Boutique.objects.bulk_create(boutiques, batch_size=BATCH_SIZE)
+
+    def category_kinds(self):
+        # Beyond the known kinds, boutiques get numbered variants ("Bijoux 2")
+        kinds = sorted(CATEGORIES)
+        self.rng.shuffle(kinds)
+        for n in range(self.categories):
+            kind = kinds[n % len(kinds)]
+            yield kind, kind if n < len(kinds) else f'{kind} {n // len(kinds) + 1}'
+
+    def create_categories(self, boutiques):
+        """
+        Return ``{boutique id: [(category, kind), ...]}``
+        """
+        pending = [
+            (Category(name=name, boutique=boutique), kind)
+            for boutique in boutiques for kind, name in self.category_kinds()
+        ]
+        Category.objects.bulk_create([category for category, _ in pending], batch_size=BATCH_SIZE)
+        by_boutique = {}
+        for category, kind in pending:
+            by_boutique.setdefault(category.boutique_id, []).append((category, kind))
+        return by_boutique
+
+    def create_products(self, boutiques, categories):
+        field = Product._meta.get_field('categories')
+        insert_sql = 'INSERT INTO {} ({}, {}) VALUES (%s, %s)'.format(
+            connection.ops.quote_name(field.m2m_db_table()),
+            connection.ops.quote_name(field.m2m_column_name()),
+            connection.ops.quote_name(field.m2m_reverse_name()),
+        )
+
+        created = 0
+        pending = []
+        for boutique in boutiques:
+            for _ in range(self.products_per_vendor):
+                if self.categories:
+                    category, kind = self.rng.choice(categories[boutique.pk])
+                else:
+                    category, kind = None, self.rng.choice(sorted(CATEGORIES))
+                pending.append((self.product(boutique, kind), category))
+                if len(pending) >= BATCH_SIZE:
+                    created += self.flush_products(pending, insert_sql)
+                    pending = []
+        if pending:
+            created += self.flush_products(pending, insert_sql)
+        return created
+
+    def flush_products(self, pending, insert_sql):
+        products = Product.objects.bulk_create([product for product, _ in pending])
+        links = [(product.pk, category.pk) for product, (_, category) in zip(products, pending) if category]
+        # The ORM would build one model instance per link row
+        with connection.cursor() as cursor:
+            cursor.executemany(insert_sql, links)
+        adjust_product_counts(Boutique, Counter(product.boutique_id for product in products))
+        adjust_product_counts(Category, Counter(category_id for _, category_id in links))
+        return len(products)
+
+    def run(self):
+        """
+        Generate the catalog in one transaction and return the number of
+        vendors and products created
+        """
+        with transaction.atomic():
+            boutiques = self.create_vendors()
+            categories = self.create_categories(boutiques)
+            products = self.create_products(boutiques, categories)
+        # bulk_create sends no signals
+        bump_catalog_version()
+        return len(boutiques), products
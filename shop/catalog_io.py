@@ -0,0 +1,171 @@
+import csv
+import json
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction
+
+from .counters import adjust_product_counts
+from .models import Boutique, Category, Product
+from .serializers import ProductImportRowSerializer
+
+
+# Columns of the CSV import/export format; categories are separated by ";"
+CSV_COLUMNS = ('title', 'description', 'price', 'stock', 'image', 'categories', 'boutique')
+CATEGORY_SEPARATOR = ';'
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """
+    Yield ``(line_number, row)`` from a CSV or JSONL stream, one row at a time
+    """
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, exc
+                continue
+            yield line_number, row
+        return
+
+    reader = csv.DictReader(stream)
+    for row in reader:
+        categories = row.get('categories') or ''
+        row['categories'] = [name.strip() for name in categories.split(CATEGORY_SEPARATOR) if name.strip()]
+        if not row.get('boutique'):
+            row.pop('boutique', None)
+        yield reader.line_num, row
+
+
+class ProductImporter:
+    """
+    Validate and insert products in batches: one ``bulk_create`` for the
+    products and one for their category links per batch, with categories
+    resolved (and created when missing) by name within each boutique
+    """
+    def __init__(self, boutique=None, batch_size=500, dry_run=False):
+        self.boutique = boutique
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.created = 0
+        self.errors = []
+        self._boutique_ids = set(Boutique.objects.values_list('id', flat=True)) if boutique is None else {boutique.pk}
+        self._categories = {}
+
+    def run(self, rows):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+            yield self.created
+
+    def _validate(self, batch):
+        valid = []
+        for line_number, row in batch:
+            if isinstance(row, Exception):
+                self.errors.append((line_number, str(row)))
+                continue
+            serializer = ProductImportRowSerializer(data=row)
+            if not serializer.is_valid():
+                self.errors.append((line_number, serializer.errors))
+                continue
+            data = serializer.validated_data
+            boutique_id = self.boutique.pk if self.boutique is not None else data.get('boutique')
+            if boutique_id not in self._boutique_ids:
+                self.errors.append((line_number, {'boutique': 'Boutique introuvable'}))
+                continue
+            valid.append((boutique_id, data))
+        return valid
+
+    def _resolve_categories(self, valid):
+        wanted = {(boutique_id, name.lower()): name for boutique_id, data in valid for name in data['categories']}
+        missing = [key for key in wanted if key not in self._categories]
+        if not missing:
+            return
+        boutique_ids = {boutique_id for boutique_id, _ in missing}
+        for category in Category.objects.filter(boutique_id__in=boutique_ids).only('id', 'name', 'boutique_id'):
+            self._categories.setdefault((category.boutique_id, category.name.lower()), category.pk)
+        new = [
+            Category(boutique_id=boutique_id, name=wanted[(boutique_id, name)])
+            for boutique_id, name in missing if (boutique_id, name) not in self._categories
+        ]
+        for category in Category.objects.bulk_create(new):
+            self._categories[(category.boutique_id, category.name.lower())] = category.pk
+
+    def import_batch(self, batch):
+        valid = self._validate(batch)
+        if self.dry_run:
+            self.created += len(valid)
+            return
+        if not valid:
+            return
+
+        with transaction.atomic():
+            self._resolve_categories(valid)
+            products = Product.objects.bulk_create([
+                Product(
+                    boutique_id=boutique_id,
+                    title=data['title'],
+                    description=data['description'],
+                    price=data['price'],
+                    stock=data['stock'],
+                    image=data['image'],
+                )
+                for boutique_id, data in valid
+            ])
+            Through = Product.categories.through
+            links = {
+                (product.pk, self._categories[(boutique_id, name.lower())])
+                for product, (boutique_id, data) in zip(products, valid)
+                for name in data['categories']
+            }
+            Through.objects.bulk_create([Through(product_id=product_id, category_id=category_id) for product_id, category_id in links])
+            # bulk_create sends no signals, so maintain the counters here
+            adjust_product_counts(Boutique, Counter(boutique_id for boutique_id, _ in valid))
+            adjust_product_counts(Category, Counter(category_id for _, category_id in links))
+        self.created += len(products)
+
+
+def export_rows(queryset, chunk_size=2000):
+    """
+    Yield export rows for a Product queryset without loading it in memory
+    """
+    queryset = queryset.order_by('id').prefetch_related('categories')
+    for product in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'title': product.title,
+            'description': product.description,
+            'price': str(product.price),
+            'stock': product.stock,
+            'image': product.image.name,
+            'categories': [category.name for category in product.categories.all()],
+            'boutique': product.boutique_id,
+        }
+
+
+def write_rows(stream, rows, fmt):
+    written = 0
+    if fmt == 'jsonl':
+        for row in rows:
+            stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+            written += 1
+        return written
+
+    writer = csv.DictWriter(stream, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        row['categories'] = CATEGORY_SEPARATOR.join(row['categories'])
+        writer.writerow(row)
+        written += 1
+    return written
@@ -0,0 +1,119 @@
+"""
+Response compression negotiated through Accept-Encoding: gzip, and brotli
+when the ``brotli`` package is installed.
+
+Large bodies of the public catalog routes are compressed once at a high
+level and cached per catalog version, URL and encoding, so the same
+catalog is not recompressed for every client.
+"""
+import gzip
+import hashlib
+
+from django.conf import settings
+from django.utils.text import compress_sequence, compress_string
+
+from .cache import get_catalog_cache, get_catalog_version
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSED_KEY = 'shop:compressed:{version}:{digest}'
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'application/xml')
+# Levels for bodies compressed on every response, and for cached ones
+FAST_LEVELS = {'br': 4, 'gzip': 6}
+CACHED_LEVELS = {'br': 9, 'gzip': 9}
+# Random gzip file name bytes against BREACH, as in Django's GZipMiddleware
+MAX_RANDOM_BYTES = 100
+
+
+def available_encodings():
+    """
+    Supported encodings, most preferred first
+    """
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(header):
+    """
+    Pick the supported encoding with the highest quality in the
+    Accept-Encoding ``header``, preferring brotli on ties; None means the
+    body is sent as is
+    """
+    qualities = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';', 1)[0].strip().lower()
+    return content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES
+
+
+def compress(body, encoding, cached=False):
+    if encoding == 'br':
+        return brotli.compress(body, quality=CACHED_LEVELS['br'] if cached else FAST_LEVELS['br'])
+    if cached:
+        # Deterministic output: the same body always gives the same bytes
+        return gzip.compress(body, compresslevel=CACHED_LEVELS['gzip'], mtime=0)
+    return compress_string(body, max_random_bytes=MAX_RANDOM_BYTES)
+
+
+def compress_stream(chunks, encoding):
+    if encoding == 'gzip':
+        yield from compress_sequence(chunks, max_random_bytes=MAX_RANDOM_BYTES)
+        return
+    compressor = brotli.Compressor(quality=FAST_LEVELS['br'])
+    for chunk in chunks:
+        # Flushed per chunk so the client receives rows as they are produced
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_cached(request, response, encoding):
+    """
+    Compressed body of ``response``, taken from the catalog cache when the
+    same URL already produced this exact body under the current catalog
+    version. Entries are matched on a digest of the body too, so a change
+    that did not move the version is never served stale.
+    """
+    body = response.content
+    etag = response.get('ETag', '')
+    # A strong ETag already identifies the body
+    digest = etag if etag.startswith('"') else hashlib.sha1(body).hexdigest()
+    identity = f'{encoding}|{response.get("Content-Type", "")}|{request.build_absolute_uri()}'
+    key = COMPRESSED_KEY.format(
+        version=get_catalog_version(),
+        digest=hashlib.sha1(identity.encode('utf-8')).hexdigest(),
+    )
+
+    cache = get_catalog_cache()
+    entry = cache.get(key)
+    if entry is not None and entry[0] == digest:
+        return entry[1]
+    compressed = compress(body, encoding, cached=True)
+    cache.set(key, (digest, compressed), timeout=getattr(settings, 'SHOP_COMPRESSION_CACHE_TIMEOUT', 3600))
+    return compressed
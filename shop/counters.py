@@ -0,0 +1,47 @@
+from collections import defaultdict
+
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Boutique, Category
+
+
+# Keeps each UPDATE below SQLite's bound parameter limit
+CHUNK_SIZE = 900
+
+
+def adjust_product_counts(model, deltas):
+    """
+    Add ``deltas`` (``{pk: delta}``) to the ``product_count`` of Boutique or
+    Category rows with ``F()`` updates, one query per distinct delta. The
+    rows are marked as modified for delta sync.
+    """
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+
+    now = timezone.now()
+    for delta, pks in by_delta.items():
+        # A drifted counter must not make a delete fail; recount_products repairs it
+        value = F('product_count') + delta if delta > 0 else Greatest(F('product_count') + delta, 0)
+        for start in range(0, len(pks), CHUNK_SIZE):
+            model.objects.filter(pk__in=pks[start:start + CHUNK_SIZE]).update(product_count=value, updated_at=now)
+
+
+def recount_products():
+    """
+    Recompute every counter from the product rows and return how many
+    boutiques and categories were wrong
+    """
+    fixed = {}
+    for model in (Boutique, Category):
+        wrong = list(
+            model.objects.annotate(actual=Count('products')).exclude(product_count=F('actual')).values_list('pk', 'actual')
+        )
+        now = timezone.now()
+        for pk, actual in wrong:
+            model.objects.filter(pk=pk).update(product_count=actual, updated_at=now)
+        fixed[model] = len(wrong)
+    return fixed[Boutique], fixed[Category]
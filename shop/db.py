@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    Apply SHOP_SQLITE_PRAGMAS to every new SQLite connection
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SHOP_SQLITE_PRAGMAS', {})
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
+
+
+connection_created.connect(configure_sqlite_connection, dispatch_uid='shop.db.configure_sqlite_connection')
@@ -0,0 +1,163 @@
+import hashlib
+
+from django.db.models import Count, Max, Min, Q
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from .cache import get_catalog_cache, get_catalog_version
+from .models import Product
+from .routers import use_primary
+from .serializers import MAX_ID
+
+
+FACETS_KEY = 'shop:product-facets:{version}:{digest}'
+
+TRUE_VALUES = ('1', 'true', 'yes', 'oui')
+FALSE_VALUES = ('0', 'false', 'no', 'non')
+
+
+# Values beyond these ranges overflow or fail in the database lookups
+ID_FIELD = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+PRICE_FIELD = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
+
+def _parse_field(params, name, field, message):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return field.run_validation(value)
+    except serializers.ValidationError:
+        raise serializers.ValidationError({name: message})
+
+
+def _parse_int(params, name):
+    return _parse_field(params, name, ID_FIELD, 'Un identifiant valide est requis.')
+
+
+def _parse_decimal(params, name):
+    return _parse_field(params, name, PRICE_FIELD, 'Un prix valide est requis (au plus 2 décimales).')
+
+
+def _parse_bool(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise serializers.ValidationError({name: 'Une valeur booléenne est requise.'})
+
+
+def parse_product_filters(params):
+    """
+    Read the public catalog filters from the query parameters
+    """
+    return {
+        'boutique': _parse_int(params, 'boutique'),
+        'category': _parse_int(params, 'category'),
+        'price_min': _parse_decimal(params, 'price_min'),
+        'price_max': _parse_decimal(params, 'price_max'),
+        'in_stock': _parse_bool(params, 'in_stock'),
+    }
+
+
+def apply_product_filters(queryset, filters, exclude=()):
+    """
+    Apply parsed filters to a Product queryset, skipping the names in ``exclude``
+    """
+    active = {name: value for name, value in filters.items() if value is not None and name not in exclude}
+    if 'boutique' in active:
+        queryset = queryset.filter(boutique_id=active['boutique'])
+    if 'category' in active:
+        queryset = queryset.filter(categories__id=active['category'])
+    if 'price_min' in active:
+        queryset = queryset.filter(price__gte=active['price_min'])
+    if 'price_max' in active:
+        queryset = queryset.filter(price__lte=active['price_max'])
+    if active.get('in_stock') is True:
+        queryset = queryset.filter(stock__gt=0)
+    elif active.get('in_stock') is False:
+        queryset = queryset.filter(stock=0)
+    return queryset
+
+
+def _format_price(value):
+    # Match the two decimal places used by ProductSerializer
+    return None if value is None else '%.2f' % value
+
+
+def compute_product_facets(filters):
+    """
+    Count products per boutique and per category, and the price range and
+    stock totals, with grouped aggregate queries. Each facet ignores its own
+    filter so the app can offer the other choices with their counts.
+    """
+    products = Product.objects.all()
+
+    by_boutique = (
+        apply_product_filters(products, filters, exclude=('boutique',))
+        .values('boutique_id', 'boutique__name')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'boutique__name')
+    )
+    by_category = (
+        Product.categories.through.objects
+        .filter(product__in=apply_product_filters(products, filters, exclude=('category',)).values('id'))
+        .values('category_id', 'category__name')
+        .annotate(count=Count('product_id'))
+        .order_by('-count', 'category__name')
+    )
+    stats = apply_product_filters(products, filters).aggregate(
+        total=Count('id'),
+        in_stock=Count('id', filter=Q(stock__gt=0)),
+        price_min=Min('price'),
+        price_max=Max('price'),
+    )
+
+    return {
+        'boutiques': [
+            {'id': row['boutique_id'], 'name': row['boutique__name'], 'count': row['count']}
+            for row in by_boutique
+        ],
+        'categories': [
+            {'id': row['category_id'], 'name': row['category__name'], 'count': row['count']}
+            for row in by_category
+        ],
+        'price': {
+            'min': _format_price(stats['price_min']),
+            'max': _format_price(stats['price_max']),
+        },
+        'total': stats['total'],
+        'in_stock': stats['in_stock'],
+    }
+
+
+def get_product_facets(filters):
+    """
+    Return the facets for ``filters``, cached per catalog version
+    """
+    cache = get_catalog_cache()
+    signature = repr(sorted((name, str(value)) for name, value in filters.items() if value is not None))
+    key = FACETS_KEY.format(
+        version=get_catalog_version(),
+        digest=hashlib.sha1(signature.encode('utf-8')).hexdigest(),
+    )
+    facets = cache.get(key)
+    if facets is None:
+        # Cached per version, so always computed from the primary
+        with use_primary():
+            facets = compute_product_facets(filters)
+        cache.set(key, facets)
+    return facets
+
+
+class ProductFilterBackend(BaseFilterBackend):
+    """
+    Filter products by ``boutique``, ``category``, ``price_min``,
+    ``price_max`` and ``in_stock``
+    """
+    def filter_queryset(self, request, queryset, view):
+        return apply_product_filters(queryset, parse_product_filters(request.query_params))
@@ -0,0 +1,215 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Widths (in pixels) of the generated renditions and their formats
+DERIVATIVE_WIDTHS = (320, 640, 1280)
+DERIVATIVE_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+DERIVATIVE_QUALITY = 80
+
+# Model image fields that get derivatives
+IMAGE_FIELDS = {
+    'shop.Product': 'image',
+    'shop.Boutique': 'image',
+    'shop.Slider': 'image',
+    'shop.CompanyConfig': 'logo',
+}
+
+_executor = None
+
+
+def derivatives_field(field_name):
+    """
+    Model field holding the width of the largest rendition of
+    ``field_name`` (0 until they exist), so serializing an image never
+    asks the storage
+    """
+    return f'{field_name}_derivatives'
+
+
+def derivative_name(name, width, extension):
+    """
+    Storage name of a rendition, stored next to the original. The source
+    extension is kept, so ``shoe.png`` and ``shoe.jpg`` get their own:
+    ``product_images/shoe.png`` -> ``product_images/shoe.png.320w.webp``
+    """
+    return f'{name}.{width}w.{extension}'
+
+
+def rendition_widths(largest):
+    """
+    Widths rendered for an image whose largest rendition is ``largest``
+    pixels wide: images are never upscaled, so a narrower source gets the
+    smaller widths plus one at its own width
+    """
+    return sorted({width for width in DERIVATIVE_WIDTHS if width < largest} | {largest})
+
+
+def largest_rendition(source_width):
+    return min(source_width, DERIVATIVE_WIDTHS[-1])
+
+
+def derivative_names(name, largest):
+    return {
+        extension: {width: derivative_name(name, width, extension) for width in rendition_widths(largest)}
+        for extension in DERIVATIVE_FORMATS
+    }
+
+
+def has_derivatives(name):
+    """
+    Width of the largest rendition of the image ``name`` when they all
+    exist, else 0. Reads the image header and asks the storage, so it is
+    only used when images are written, never when they are served.
+    """
+    from PIL import Image
+
+    try:
+        with default_storage.open(name) as stream, Image.open(stream) as image:
+            largest = largest_rendition(image.width)
+    except (OSError, ValueError):
+        return 0
+    # The last rendition written is used as the completion marker
+    last_extension = list(DERIVATIVE_FORMATS)[-1]
+    return largest if default_storage.exists(derivative_name(name, largest, last_extension)) else 0
+
+
+def render_derivatives(source_path, force=False):
+    """
+    Write every rendition of the image at ``source_path`` next to it and
+    return the paths written. Runs in worker processes, so it only deals
+    with filesystem paths and Pillow.
+    """
+    from PIL import Image
+
+    if not os.path.exists(source_path):
+        return []
+
+    written = []
+    with Image.open(source_path) as original:
+        original.load()
+        for extension, image_format in DERIVATIVE_FORMATS.items():
+            for width in rendition_widths(largest_rendition(original.width)):
+                target = derivative_name(source_path, width, extension)
+                if not force and os.path.exists(target):
+                    continue
+                # Exactly ``width`` wide, so the ``w`` descriptor is right
+                height = max(1, round(original.height * width / original.width))
+                image = original.resize((width, height), Image.LANCZOS) if width != original.width else original.copy()
+                if image_format == 'JPEG' and image.mode != 'RGB':
+                    background = Image.new('RGB', image.size, (255, 255, 255))
+                    rgba = image.convert('RGBA')
+                    background.paste(rgba, mask=rgba.getchannel('A'))
+                    image = background
+                image.save(target, image_format, quality=DERIVATIVE_QUALITY)
+                written.append(target)
+    return written
+
+
+def mark_derivatives(model, field_name, widths):
+    """
+    Record the largest rendition width of each image of ``widths`` (name ->
+    width, 0 when missing) on every row using it, and return the number of
+    rows changed. Rows are marked as modified so delta sync clients fetch
+    the new srcset.
+    """
+    column = derivatives_field(field_name)
+    by_width = {}
+    for name, width in widths.items():
+        by_width.setdefault(width, []).append(name)
+    changed = 0
+    for width, names in by_width.items():
+        # Batched to stay under SQLite's bound parameter limit
+        for start in range(0, len(names), 500):
+            # A queryset update sends no post_save, so nothing is rendered again
+            changed += model._default_manager.filter(**{f'{field_name}__in': names[start:start + 500]}).exclude(
+                **{column: width}
+            ).update(**{column: width, 'updated_at': timezone.now()})
+    return changed
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=getattr(settings, 'SHOP_IMAGE_WORKERS', 2))
+    return _executor
+
+
+def _storage_path(name):
+    try:
+        return default_storage.path(name)
+    except NotImplementedError:
+        # Remote storages have no local path to render from
+        return None
+
+
+def _on_rendered(model, field_name, name, future):
+    from .cache import bump_catalog_version
+
+    try:
+        future.result()
+        largest = has_derivatives(name)
+        if largest and mark_derivatives(model, field_name, {name: largest}):
+            # Serialized catalogs can now advertise the new renditions
+            bump_catalog_version()
+    except Exception:
+        logger.exception('Image derivative generation failed')
+    finally:
+        # Usually run in the executor's thread, whose connection nobody closes
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def schedule_derivatives(fieldfile):
+    """
+    Generate the renditions of an uploaded image in the process pool,
+    off the request thread, unless they already exist, and keep the
+    rendition width of the row up to date
+    """
+    if not fieldfile:
+        return
+    model, field_name, name = type(fieldfile.instance), fieldfile.field.name, fieldfile.name
+    column = derivatives_field(field_name)
+    largest = has_derivatives(name)
+    if getattr(fieldfile.instance, column) != largest:
+        mark_derivatives(model, field_name, {name: largest})
+        setattr(fieldfile.instance, column, largest)
+    if largest:
+        return
+    path = _storage_path(name)
+    if path is None or not os.path.exists(path):
+        return
+    if not getattr(settings, 'SHOP_IMAGE_DERIVATIVES_ASYNC', True):
+        render_derivatives(path)
+        largest = has_derivatives(name)
+        mark_derivatives(model, field_name, {name: largest})
+        setattr(fieldfile.instance, column, largest)
+        return
+    future = get_executor().submit(render_derivatives, path)
+    future.add_done_callback(partial(_on_rendered, model, field_name, name))
+
+
+def srcset(name, largest, request=None):
+    """
+    Map of format -> ``{"320w": url, ...}`` for an image, or None when its
+    renditions have not been generated yet (``largest`` is the width
+    recorded on the row)
+    """
+    if not name or not largest:
+        return None
+    result = {}
+    for extension, names in derivative_names(name, largest).items():
+        urls = {}
+        for width, derivative in names.items():
+            url = default_storage.url(derivative)
+            urls[f'{width}w'] = request.build_absolute_uri(url) if request is not None else url
+        result[extension] = urls
+    return result
@@ -0,0 +1,86 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.catalog_generator import CatalogGenerator
+from shop.models import Boutique, Category, Product, VendorUser
+
+from .benchmark_api import benchmark_environment, git_commit, write_report
+
+
+PRODUCTS_PER_VENDOR = 500
+
+
+class Command(BaseCommand):
+    help = 'Measure admin changelist render time and queries as the catalog grows, as a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma separated catalog sizes (products)')
+        parser.add_argument('--iterations', type=int, default=5, help='Renders per page and size')
+        parser.add_argument('--output', help='File receiving the JSON report (defaults to stdout)')
+
+    def pages(self):
+        boutique = Boutique.objects.order_by('pk').first()
+        category = Category.objects.filter(boutique=boutique).first()
+        return {
+            'product list': (reverse('admin:shop_product_changelist'), {}),
+            'product list page 50': (reverse('admin:shop_product_changelist'), {'p': 50}),
+            'products of a boutique': (reverse('admin:shop_product_changelist'), {'boutique__id__exact': boutique.pk}),
+            'products of a category': (reverse('admin:shop_product_changelist'), {'categories__id__exact': category.pk}),
+            'product search': (reverse('admin:shop_product_changelist'), {'q': 'robe wax'}),
+            'category list': (reverse('admin:shop_category_changelist'), {}),
+            'boutique list': (reverse('admin:shop_boutique_changelist'), {}),
+        }
+
+    def measure(self, client, path, params, iterations):
+        latencies, queries, statuses = [], [], set()
+        for _ in range(iterations):
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(path, params)
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(captured))
+            statuses.add(response.status_code)
+        return {
+            'status': sorted(statuses),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'max_ms': round(max(latencies) * 1000, 2),
+            'queries': statistics.median(queries),
+        }
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        results = {}
+        with benchmark_environment():
+            admin = VendorUser.objects.create_superuser(username='benchmark-admin', password='benchmark-password')
+            client = Client()
+            client.force_login(admin)
+
+            for seed, size in enumerate(sizes, start=1):
+                # Grow the same catalog to the next size
+                missing = size - Product.objects.count()
+                if missing > 0:
+                    started = time.perf_counter()
+                    CatalogGenerator(
+                        max(1, missing // PRODUCTS_PER_VENDOR), min(missing, PRODUCTS_PER_VENDOR), categories=8, seed=seed,
+                    ).run()
+                    self.stderr.write(f'{Product.objects.count()} products after {time.perf_counter() - started:.1f}s of generation')
+
+                results[str(size)] = {}
+                for name, (path, params) in self.pages().items():
+                    results[str(size)][name] = self.measure(client, path, params, options['iterations'])
+                    self.stderr.write(f'  {name}: p50 {results[str(size)][name]["p50_ms"]} ms, {results[str(size)][name]["queries"]} queries')
+
+        write_report(self, {
+            'commit': git_commit(),
+            'generated_at': timezone.now().isoformat(),
+            'iterations': options['iterations'],
+            'sizes': results,
+        }, options['output'])
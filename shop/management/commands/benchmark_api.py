@@ -0,0 +1,233 @@
+import base64
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from shop import urls as shop_urls
+from shop.catalog_generator import CatalogGenerator
+from shop.models import Category, CompanyConfig, Product, Slider, VendorUser
+from shop.reservations import reserve_stock
+
+
+PASSWORD = 'benchmark-password'
+PRODUCTS_PER_BOUTIQUE = 100
+PNG_PIXEL = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg=='
+)
+
+
+def seed_catalog(size):
+    """
+    Fill the empty benchmark database with ``size`` products spread over
+    boutiques of PRODUCTS_PER_BOUTIQUE products each. Returns a vendor and
+    one of its products, with stock to spare for the reservation scenarios.
+    """
+    generator = CatalogGenerator(
+        max(1, size // PRODUCTS_PER_BOUTIQUE), min(size, PRODUCTS_PER_BOUTIQUE), categories=5,
+        seed=size, password=PASSWORD,
+    )
+    generator.run()
+    CompanyConfig.objects.create(name='Benchmark', whatsapp_number='+22500000000', address='Abidjan')
+    Slider.objects.bulk_create([
+        Slider(image=f'slider_images/{n}.jpg', title=f'Slider {n}', description='Promotion', order=n)
+        for n in range(3)
+    ])
+
+    vendor = VendorUser.objects.get(username=generator.usernames()[0])
+    product = Product.objects.filter(boutique__owner=vendor).first()
+    Product.objects.filter(pk=product.pk).update(stock=1_000_000)
+    return vendor, product
+
+
+@contextmanager
+def benchmark_environment():
+    """
+    Run the enclosed block against a throwaway test database, with local
+    memory caches and a temporary media root, so a benchmark never touches
+    the real data
+    """
+    caches = {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark-{alias}'}
+        for alias in settings.CACHES
+    }
+    # DEBUG would log every query, seeding included, and slow requests down
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with tempfile.TemporaryDirectory() as media_root, override_settings(CACHES=caches, MEDIA_ROOT=media_root):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def write_report(command, report, path=None):
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if path:
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(output + '\n')
+    else:
+        command.stdout.write(output)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed catalogs of increasing size in a throwaway database and measure every shop URL '
+        'in-process (latency percentiles, queries and bytes per request) as a JSON report'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,1000,100000', help='Comma separated catalog sizes (products)')
+        parser.add_argument('--iterations', type=int, default=10, help='Requests per endpoint and size')
+        parser.add_argument('--output', help='File receiving the JSON report (defaults to stdout)')
+
+    def scenarios(self, vendor, product):
+        """
+        ``(label, url name, method, prepare)``; ``prepare()`` runs untimed
+        before each request and returns the URL kwargs and request body
+        """
+        category = Category.objects.filter(boutique__owner=vendor).first()
+        cart = {'items': [{'product': product.pk, 'quantity': 1}]}
+
+        def new_product():
+            created = Product.objects.create(
+                title='Temporaire', description='', price=1, image='product_images/tmp.jpg',
+                stock=1, boutique=product.boutique,
+            )
+            return {'pk': created.pk}, None
+
+        def new_reservation():
+            return {'token': reserve_stock([(product.pk, 1)]).token}, None
+
+        bulk_update = {'update': [
+            {'id': pk, 'stock': 1000}
+            for pk in Product.objects.filter(boutique=product.boutique).values_list('pk', flat=True)[:50]
+        ]}
+
+        def product_upload():
+            # Multipart, like the vendor app; the boutique is overridden server side
+            return {}, {
+                'title': 'Nouveau', 'description': 'Créé par le benchmark', 'price': '10.00', 'stock': 5,
+                'boutique': product.boutique_id, 'category_ids': [category.pk],
+                'image': SimpleUploadedFile('nouveau.png', PNG_PIXEL, content_type='image/png'),
+            }
+
+        return [
+            ('POST vendor-login', 'vendor-login', 'post', lambda: ({}, {'username': vendor.username, 'password': PASSWORD})),
+            ('POST vendor-logout', 'vendor-logout', 'post', lambda: ({}, None)),
+            ('POST change-password', 'change-password', 'post',
+             lambda: ({}, {'old_password': PASSWORD, 'new_password': PASSWORD})),
+            ('GET vendor-dashboard', 'vendor-dashboard', 'get', lambda: ({}, None)),
+            ('GET vendor-products', 'vendor-products', 'get', lambda: ({}, None)),
+            ('POST vendor-products', 'vendor-products', 'post', product_upload),
+            ('POST vendor-products-bulk', 'vendor-products-bulk', 'post', lambda: ({}, bulk_update)),
+            ('GET vendor-product-detail', 'vendor-product-detail', 'get', lambda: ({'pk': product.pk}, None)),
+            ('PATCH vendor-product-detail', 'vendor-product-detail', 'patch', lambda: ({'pk': product.pk}, {'stock': 1_000_000})),
+            ('DELETE vendor-product-detail', 'vendor-product-detail', 'delete', new_product),
+            ('GET vendor-categories', 'vendor-categories', 'get', lambda: ({}, None)),
+            ('POST vendor-categories', 'vendor-categories', 'post',
+             lambda: ({}, {'name': 'Nouvelle catégorie', 'boutique': product.boutique_id})),
+            ('GET vendor-category-detail', 'vendor-category-detail', 'get', lambda: ({'pk': category.pk}, None)),
+            ('PATCH vendor-category-detail', 'vendor-category-detail', 'patch', lambda: ({'pk': category.pk}, {'description': 'Modifiée'})),
+            ('GET init-app-data', 'init-app-data', 'get', lambda: ({}, None)),
+            ('GET sync', 'sync', 'get', lambda: ({}, None)),
+            ('GET public-products', 'public-products', 'get', lambda: ({}, None)),
+            ('GET public-products-search', 'public-products-search', 'get', lambda: ({}, {'q': 'bleu'})),
+            ('GET public-products-export', 'public-products-export', 'get', lambda: ({}, None)),
+            ('GET public-boutiques', 'public-boutiques', 'get', lambda: ({}, None)),
+            ('GET public-sliders', 'public-sliders', 'get', lambda: ({}, None)),
+            ('POST public-quote', 'public-quote', 'post', lambda: ({}, cart)),
+            ('POST public-reserve', 'public-reserve', 'post', lambda: ({}, cart)),
+            ('DELETE public-reserve-cancel', 'public-reserve-cancel', 'delete', new_reservation),
+            ('POST public-reserve-confirm', 'public-reserve-confirm', 'post', new_reservation),
+            ('GET public-config', 'public-config', 'get', lambda: ({}, None)),
+            ('GET metrics', 'metrics', 'get', lambda: ({}, None)),
+        ]
+
+    def measure(self, client, method, name, prepare, iterations):
+        latencies, queries, sizes, statuses = [], [], [], set()
+        for _ in range(iterations):
+            kwargs, data = prepare()
+            path = reverse(name, kwargs=kwargs)
+            if method == 'get' or any(isinstance(value, File) for value in (data or {}).values()):
+                call = lambda: getattr(client, method)(path, data)
+            else:
+                call = lambda: getattr(client, method)(path, data, content_type='application/json')
+
+            # The query log holds a bounded number of queries
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = call()
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(captured))
+            sizes.append(len(body))
+            statuses.add(response.status_code)
+
+        return {
+            'status': sorted(statuses),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'queries': statistics.median(queries),
+            'bytes': statistics.median(sizes),
+        }
+
+    def run_size(self, size, iterations):
+        call_command('flush', interactive=False, verbosity=0)
+        started = time.perf_counter()
+        vendor, product = seed_catalog(size)
+        self.stderr.write(f'{size} products seeded in {time.perf_counter() - started:.1f}s')
+
+        client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=vendor).key}')
+        scenarios = self.scenarios(vendor, product)
+        missing = {pattern.name for pattern in shop_urls.urlpatterns} - {name for _, name, _, _ in scenarios}
+        if missing:
+            raise CommandError(f'No benchmark scenario for: {", ".join(sorted(missing))}')
+
+        results = {}
+        for label, name, method, prepare in scenarios:
+            results[label] = self.measure(client, method, name, prepare, iterations)
+            self.stderr.write(f'  {label}: p50 {results[label]["p50_ms"]} ms, {results[label]["queries"]} queries')
+        return results
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        with benchmark_environment():
+            report = {
+                'commit': git_commit(),
+                'generated_at': timezone.now().isoformat(),
+                'iterations': options['iterations'],
+                'sizes': {str(size): self.run_size(size, options['iterations']) for size in sizes},
+            }
+        write_report(self, report, options['output'])
@@ -0,0 +1,76 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+
+
+DEFAULT_PATHS = [
+    '/api/init-app-data/',
+    '/api/public/products/',
+    '/api/public/boutiques/',
+    '/api/public/sliders/',
+    '/api/public/config/',
+]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Compare the WSGI (thread per request) and ASGI code paths of the public catalog under concurrent slow clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per deployment')
+        parser.add_argument('--concurrency', type=int, default=50, help='Clients in flight at once')
+        parser.add_argument('--workers', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--client-delay', type=float, default=0.05, help='Seconds a slow client holds its connection')
+        parser.add_argument('--path', action='append', dest='paths', help='Path to request (repeatable)')
+
+    def run_wsgi(self, paths, options):
+        # A WSGI worker stays busy until the slow client has read the response
+        def call(index):
+            started = time.perf_counter()
+            Client().get(paths[index % len(paths)])
+            time.sleep(options['client_delay'])
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            return list(executor.map(call, range(options['requests'])))
+
+    async def run_asgi(self, paths, options):
+        client = AsyncClient()
+        slots = asyncio.Semaphore(options['concurrency'])
+
+        async def call(index):
+            async with slots:
+                started = time.perf_counter()
+                await client.get(paths[index % len(paths)])
+                await asyncio.sleep(options['client_delay'])
+                return time.perf_counter() - started
+
+        return await asyncio.gather(*(call(index) for index in range(options['requests'])))
+
+    def report(self, name, latencies, elapsed):
+        self.stdout.write(
+            f'{name}: {len(latencies) / elapsed:.0f} req/s, '
+            f'p50 {statistics.median(latencies) * 1000:.1f} ms, '
+            f'p95 {percentile(latencies, 0.95) * 1000:.1f} ms'
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or DEFAULT_PATHS
+        # Warm the catalog snapshot so both runs start from the same state
+        Client().get('/api/init-app-data/')
+
+        started = time.perf_counter()
+        latencies = self.run_wsgi(paths, options)
+        self.report(f'wsgi ({options["workers"]} workers)', latencies, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        latencies = asyncio.run(self.run_asgi(paths, options))
+        self.report(f'asgi ({options["concurrency"]} in flight)', latencies, time.perf_counter() - started)
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, transaction
+
+from shop.models import Boutique, Product, StockReservation
+from shop.reservations import InsufficientStock, reserve_stock
+
+
+class Command(BaseCommand):
+    help = 'Hammer the stock reservation path from concurrent clients and check for oversells'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=200, help='Initial stock of the benchmark product')
+        parser.add_argument('--clients', type=int, default=300, help='Concurrent clients')
+        parser.add_argument('--quantity', type=int, default=1, help='Quantity reserved by each client')
+
+    def handle(self, *args, **options):
+        boutique = Boutique.objects.first()
+        if boutique is None:
+            raise CommandError('At least one boutique is required')
+
+        product = Product.objects.create(
+            title='Benchmark reservations', description='', price=1,
+            image='', stock=options['stock'], boutique=boutique,
+        )
+        reserved, sold_out, errors = [], [], []
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['clients'])
+
+        def client():
+            try:
+                barrier.wait()
+                reservation = reserve_stock([(product.pk, options['quantity'])])
+                with lock:
+                    reserved.append(reservation.pk)
+            except InsufficientStock:
+                with lock:
+                    sold_out.append(1)
+            except OperationalError as exc:
+                with lock:
+                    errors.append(str(exc))
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=client) for _ in range(options['clients'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        product.refresh_from_db()
+        held = len(reserved) * options['quantity']
+        oversold = held > options['stock'] or product.stock != options['stock'] - held
+
+        with transaction.atomic():
+            StockReservation.objects.filter(pk__in=reserved).delete()
+            product.delete()
+
+        self.stdout.write(
+            f'{options["clients"]} clients in {elapsed:.2f}s: {len(reserved)} reserved, '
+            f'{len(sold_out)} sold out, {len(errors)} database errors, final stock {product.stock}'
+        )
+        if oversold:
+            raise CommandError('Oversell detected')
+        self.stdout.write(self.style.SUCCESS('No oversell'))
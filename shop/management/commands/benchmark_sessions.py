@@ -0,0 +1,69 @@
+import threading
+import time
+from importlib import import_module
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+
+from shop.sessions import write_behind
+
+
+ENGINES = ('django.contrib.sessions.backends.db', 'shop.sessions')
+
+
+class Command(BaseCommand):
+    help = 'Compare session engines under concurrent vendor logins'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--logins', type=int, default=100, help='Logins per client')
+
+    def run_engine(self, engine, threads, logins):
+        store_class = import_module(engine).SessionStore
+        created = []
+        failures = []
+        lock = threading.Lock()
+
+        def client(worker):
+            keys = []
+            try:
+                for i in range(logins):
+                    try:
+                        # A login creates a session, the next request reads it
+                        session = store_class()
+                        session['_auth_user_id'] = str(worker * logins + i)
+                        session.save(must_create=True)
+                        keys.append(session.session_key)
+                        store_class(session.session_key).load()
+                    except OperationalError as exc:
+                        with lock:
+                            failures.append(str(exc))
+            finally:
+                with lock:
+                    created.extend(keys)
+                close_old_connections()
+
+        workers = [threading.Thread(target=client, args=(n,)) for n in range(threads)]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+
+        write_behind.flush()
+        Session.objects.filter(session_key__in=created).delete()
+        for key in created:
+            store_class().delete(key)
+        write_behind.flush()
+        return elapsed, len(created), failures
+
+    def handle(self, *args, **options):
+        threads, logins = options['threads'], options['logins']
+        for engine in ENGINES:
+            elapsed, count, failures = self.run_engine(engine, threads, logins)
+            self.stdout.write(
+                f'{engine}: {count} logins by {threads} clients in {elapsed:.2f}s '
+                f'({count / elapsed:.0f}/s), {len(failures)} lock errors'
+            )
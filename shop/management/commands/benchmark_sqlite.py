@@ -0,0 +1,90 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shop.db import apply_pragmas
+
+
+READ_SQL = 'SELECT id, title, price, stock FROM shop_product ORDER BY created_at DESC, id DESC LIMIT 20'
+WRITE_SQL = 'UPDATE shop_product SET stock = stock WHERE id IN (SELECT id FROM shop_product LIMIT 50)'
+
+PROFILES = {
+    'default': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'tuned': None,  # SHOP_SQLITE_PRAGMAS with WAL
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure read throughput while vendor writes are in flight, with and without the SQLite profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent reader threads')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile')
+        parser.add_argument('--write-hold', type=float, default=0.05, help='Seconds each write transaction holds the lock')
+
+    def run_profile(self, path, pragmas, options):
+        stop = threading.Event()
+        reads, errors, writes = [0], [0], [0]
+        lock = threading.Lock()
+
+        def connect():
+            connection = sqlite3.connect(path, timeout=0.1, isolation_level=None, check_same_thread=False)
+            apply_pragmas(connection.cursor(), pragmas)
+            return connection
+
+        def reader():
+            connection = connect()
+            while not stop.is_set():
+                try:
+                    connection.execute(READ_SQL).fetchall()
+                    with lock:
+                        reads[0] += 1
+                except sqlite3.OperationalError:
+                    with lock:
+                        errors[0] += 1
+            connection.close()
+
+        def writer():
+            connection = connect()
+            while not stop.is_set():
+                try:
+                    connection.execute('BEGIN IMMEDIATE')
+                    connection.execute(WRITE_SQL)
+                    time.sleep(options['write_hold'])
+                    connection.execute('COMMIT')
+                    writes[0] += 1
+                except sqlite3.OperationalError:
+                    if connection.in_transaction:
+                        connection.execute('ROLLBACK')
+            connection.close()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return reads[0], errors[0], writes[0]
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES['default']['NAME']
+        for name, pragmas in PROFILES.items():
+            if pragmas is None:
+                pragmas = {**settings.SHOP_SQLITE_PRAGMAS, 'journal_mode': 'WAL'}
+            with tempfile.TemporaryDirectory() as directory:
+                # Work on a copy so the benchmark never touches the real data
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                shutil.copyfile(source, path)
+                reads, errors, writes = self.run_profile(path, pragmas, options)
+            self.stdout.write(
+                f'{name}: {reads / options["duration"]:.0f} reads/s, '
+                f'{errors} reads blocked by a writer, {writes} writes'
+            )
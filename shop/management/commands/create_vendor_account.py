@@ -1,9 +1,20 @@
-from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils.crypto import get_random_string
+from shop.cache import bump_catalog_version
 from shop.models import Boutique, VendorUser
 
 
+DEFAULT_BOUTIQUE_IMAGE = 'boutique_images/default.jpg'  # Placeholder image
+
+
 class Command(BaseCommand):
     help = 'Create a new vendor account with an initial password'
 
@@ -12,10 +23,15 @@ class Command(BaseCommand):
         parser.add_argument('--email', type=str, help='Email for the vendor account (optional)')
         parser.add_argument('--boutique-name', type=str, help='Name of the boutique')
         parser.add_argument('--description', type=str, help='Description of the boutique')
+        parser.add_argument('--from-file', type=str, help='CSV or JSON file of vendors (username, email, boutique_name, description)')
+        parser.add_argument('--output', type=str, help='CSV file receiving the generated credentials (required with --from-file)')
+        parser.add_argument('--workers', type=int, default=None, help='Processes used to hash passwords (defaults to the CPU count)')
 
     def handle(self, *args, **options):
-        username = options['username']
-        email = options['email']
+        if options['from_file']:
+            return self.handle_batch(options)
+
+        username, email = self.normalize_account(options['username'], options['email'])
         boutique_name = options['boutique_name']
         description = options['description']
 
@@ -27,29 +43,112 @@ class Command(BaseCommand):
 
         # Generate a random initial password
         initial_password = get_random_string(length=12)
-        
+
         # Create the vendor user
         vendor_user = VendorUser.objects.create_user(
             username=username,
-            email=email or '',
+            email=email,
             password=initial_password
         )
-        
-        # Create the boutique and associate it with the vendor user
-        boutique = Boutique.objects.create(
+
+        # Create the boutique already linked to the vendor user
+        Boutique.objects.create(
             name=boutique_name,
             description=description or f'Boutique for {username}',
-            image='boutique_images/default.jpg'  # Placeholder image
+            image=DEFAULT_BOUTIQUE_IMAGE,
+            owner=vendor_user
         )
-        
-        # Link the boutique to the vendor user
-        boutique.owner = vendor_user
-        boutique.save()
-        
+
         self.stdout.write(
             self.style.SUCCESS(
                 f'Successfully created vendor account "{username}" with boutique "{boutique_name}"\n'
                 f'Initial password: {initial_password}\n'
                 f'The vendor should change this password after first login.'
             )
-        )
\ No newline at end of file
+        )
+
+    def normalize_account(self, username, email):
+        """
+        Username and email as stored, for a single account and a batch alike
+        """
+        return (
+            VendorUser.normalize_username((username or '').strip()),
+            VendorUser.objects.normalize_email((email or '').strip()),
+        )
+
+    def read_vendors(self, path):
+        with open(path, newline='', encoding='utf-8-sig') as stream:
+            if path.endswith('.json'):
+                return json.load(stream)
+            return list(csv.DictReader(stream))
+
+    def handle_batch(self, options):
+        if not options['output']:
+            raise CommandError('--output is required with --from-file')
+
+        vendors = self.read_vendors(options['from_file'])
+        for vendor in vendors:
+            vendor['username'], vendor['email'] = self.normalize_account(vendor.get('username'), vendor.get('email'))
+        usernames = [vendor.get('username') for vendor in vendors]
+        existing = set(VendorUser.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+        accepted = []
+        seen = set()
+        for line, vendor in enumerate(vendors, start=1):
+            username = vendor.get('username')
+            if not username or not vendor.get('boutique_name'):
+                self.stderr.write(f'Entry {line}: username and boutique_name are required')
+            elif username in existing or username in seen:
+                self.stderr.write(f'Entry {line}: username "{username}" already exists')
+            else:
+                seen.add(username)
+                accepted.append(vendor)
+
+        if not accepted:
+            raise CommandError('No vendor account to create')
+
+        # Credentials are written before the accounts are committed: an
+        # output that cannot be written leaves no account without password.
+        # The file is only readable by the current user.
+        fd = os.open(options['output'], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, 'w', newline='', encoding='utf-8') as stream:
+                # PBKDF2 dominates the run time, so hash in parallel processes
+                passwords = [get_random_string(length=12) for _ in accepted]
+                with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as executor:
+                    hashes = list(executor.map(make_password, passwords, chunksize=16))
+
+                with transaction.atomic():
+                    users = VendorUser.objects.bulk_create([
+                        VendorUser(username=vendor['username'], email=vendor['email'], password=password_hash)
+                        for vendor, password_hash in zip(accepted, hashes)
+                    ])
+                    Boutique.objects.bulk_create([
+                        Boutique(
+                            name=vendor['boutique_name'],
+                            description=vendor.get('description') or f'Boutique for {user.username}',
+                            image=DEFAULT_BOUTIQUE_IMAGE,
+                            owner=user,
+                        )
+                        for vendor, user in zip(accepted, users)
+                    ])
+
+                    writer = csv.writer(stream)
+                    writer.writerow(['username', 'password', 'boutique_name'])
+                    for vendor, password in zip(accepted, passwords):
+                        writer.writerow([vendor['username'], password, vendor['boutique_name']])
+                    stream.flush()
+                    os.fsync(stream.fileno())
+        except BaseException:
+            # No account was created, drop the passwords written for them
+            os.remove(options['output'])
+            raise
+        bump_catalog_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully created {len(accepted)} vendor accounts with their boutiques\n'
+                f'Initial passwords written to {options["output"]}\n'
+                f'The vendors should change these passwords after first login.'
+            )
+        )
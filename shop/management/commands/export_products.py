@@ -0,0 +1,36 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.catalog_io import detect_format, export_rows, write_rows
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Export products to a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Output file ("-" for stdout)')
+        parser.add_argument('--boutique', type=int, help='Only export the products of this boutique')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format (guessed from the extension by default)')
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.all()
+        if options['boutique'] is not None:
+            queryset = queryset.filter(boutique_id=options['boutique'])
+
+        fmt = detect_format(options['path'], options['format'])
+        started = time.monotonic()
+        if options['path'] == '-':
+            written = write_rows(sys.stdout, export_rows(queryset), fmt)
+        else:
+            with open(options['path'], 'w', newline='', encoding='utf-8') as stream:
+                written = write_rows(stream, export_rows(queryset), fmt)
+
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            self.style.SUCCESS(
+                f'Exported {written} products in {elapsed:.1f}s ({written / elapsed if elapsed else 0:.0f} rows/s)'
+            )
+        )
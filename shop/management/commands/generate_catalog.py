@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.crypto import get_random_string
+
+from shop.catalog_generator import CatalogGenerator
+from shop.models import VendorUser
+
+
+class Command(BaseCommand):
+    help = 'Populate the database with a synthetic catalog of vendors, boutiques, categories and products'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=100, help='Vendor accounts, one boutique each')
+        parser.add_argument('--products-per-vendor', type=int, default=100, help='Products in each boutique')
+        parser.add_argument('--categories', type=int, default=5, help='Categories in each boutique')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; also part of the generated usernames')
+        parser.add_argument('--password', type=str, help='Password of every generated vendor (random by default)')
+
+    def handle(self, *args, **options):
+        if options['vendors'] < 1:
+            raise CommandError('--vendors must be at least 1')
+        password = options['password'] or get_random_string(length=12)
+        generator = CatalogGenerator(
+            options['vendors'], options['products_per_vendor'], options['categories'],
+            seed=options['seed'], password=password,
+        )
+        if VendorUser.objects.filter(username__in=generator.usernames()[:1]).exists():
+            raise CommandError(f'A catalog was already generated with --seed {options["seed"]}, pick another seed')
+
+        started = time.monotonic()
+        vendors, products = generator.run()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Generated {vendors} boutiques and {products} products in {time.monotonic() - started:.1f}s\n'
+                f'Vendor usernames: {generator.prefix}0 to {generator.prefix}{vendors - 1}\n'
+                f'Vendor password: {password}'
+            )
+        )
@@ -0,0 +1,47 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from shop.cache import bump_catalog_version
+from shop.images import IMAGE_FIELDS, has_derivatives, mark_derivatives, render_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG renditions for existing catalog images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (defaults to the CPU count)')
+        parser.add_argument('--force', action='store_true', help='Regenerate renditions that already exist')
+
+    def handle(self, *args, **options):
+        paths = set()
+        images = {}
+        for label, field_name in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            names = model._default_manager.exclude(**{field_name: ''}).values_list(field_name, flat=True)
+            images[label] = {name for name in names.iterator() if name}
+            paths.update(default_storage.path(name) for name in images[label])
+
+        written = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [executor.submit(render_derivatives, path, options['force']) for path in sorted(paths)]
+            for future in futures:
+                try:
+                    written += len(future.result())
+                except Exception as exc:
+                    self.stdout.write(self.style.WARNING(f'Skipped an image: {exc}'))
+
+        # Serializers only advertise the renditions recorded on the rows
+        marked = 0
+        for label, names in images.items():
+            widths = {name: has_derivatives(name) for name in names}
+            marked += mark_derivatives(apps.get_model(label), IMAGE_FIELDS[label], widths)
+
+        if written or marked:
+            bump_catalog_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Processed {len(paths)} images, wrote {written} renditions')
+        )
@@ -0,0 +1,52 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.cache import bump_catalog_version
+from shop.catalog_io import ProductImporter, detect_format, read_rows
+from shop.models import Boutique
+
+
+class Command(BaseCommand):
+    help = 'Import products in bulk from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='CSV or JSONL file to import')
+        parser.add_argument('--boutique', type=int, help='Boutique id for every row (otherwise read from the "boutique" column)')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format (guessed from the extension by default)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows validated and inserted per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without writing anything')
+
+    def handle(self, *args, **options):
+        boutique = None
+        if options['boutique'] is not None:
+            try:
+                boutique = Boutique.objects.get(pk=options['boutique'])
+            except Boutique.DoesNotExist:
+                raise CommandError(f'Boutique {options["boutique"]} does not exist')
+
+        fmt = detect_format(options['path'], options['format'])
+        importer = ProductImporter(boutique=boutique, batch_size=options['batch_size'], dry_run=options['dry_run'])
+
+        started = time.monotonic()
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                for created in importer.run(read_rows(stream, fmt)):
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(f'{created} products imported ({created / elapsed:.0f} rows/s)')
+        finally:
+            # Batches committed before a failing one are kept
+            if importer.created and not options['dry_run']:
+                bump_catalog_version()
+
+        for line_number, error in importer.errors:
+            self.stderr.write(f'Line {line_number}: {json.dumps(error, ensure_ascii=False)}')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {importer.created} products with {len(importer.errors)} errors '
+                f'in {elapsed:.1f}s ({importer.created / elapsed if elapsed else 0:.0f} rows/s)'
+            )
+        )
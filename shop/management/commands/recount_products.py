@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shop.cache import bump_catalog_version
+from shop.counters import recount_products
+
+
+class Command(BaseCommand):
+    help = 'Recompute the product counters of every boutique and category'
+
+    def handle(self, *args, **options):
+        boutiques, categories = recount_products()
+        if boutiques or categories:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Fixed {boutiques} boutique and {categories} category counters'))
@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Refresh the SQLite read replicas with a consistent copy of the primary database'
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Snapshots only apply to SQLite; use database replication instead')
+
+        replicas = getattr(settings, 'SHOP_READ_REPLICAS', [])
+        if not replicas:
+            raise CommandError('No replica configured in SHOP_READ_REPLICAS')
+
+        source = sqlite3.connect(str(primary['NAME']))
+        try:
+            for alias in replicas:
+                target = sqlite3.connect(str(settings.DATABASES[alias]['NAME']), timeout=30)
+                try:
+                    # The online backup API copies a consistent snapshot while
+                    # the primary keeps serving writes
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f'Replica "{alias}" refreshed'))
+        finally:
+            source.close()
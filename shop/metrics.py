@@ -0,0 +1,264 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+Each thread records into its own shard, so the request path takes no lock.
+Every process periodically writes its totals to its own file in
+SHOP_METRICS_DIR, and the metrics endpoint adds up the files of all the
+workers. Files no longer refreshed (workers that exited) are dropped after
+SHOP_METRICS_RETENTION_INTERVALS flush intervals.
+"""
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METHODS = ('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE')
+UNMATCHED_ROUTE = 'unmatched'
+
+# [query count, query seconds] of the request being handled
+_request_queries = ContextVar('shop_request_queries', default=None)
+
+
+class RouteStats:
+    __slots__ = ('count', 'duration_sum', 'buckets', 'size_sum', 'size_count', 'queries', 'query_time', 'statuses')
+
+    def __init__(self):
+        self.count = 0
+        self.duration_sum = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.size_sum = 0
+        self.size_count = 0
+        self.queries = 0
+        self.query_time = 0.0
+        self.statuses = {}
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class MetricsRegistry:
+    """
+    Request metrics of this process, sharded per thread
+    """
+    def __init__(self, directory=None, flush_interval=10, retention_intervals=360):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.retention_intervals = retention_intervals
+        self._reset()
+
+    def _reset(self):
+        # Also run in forked children: they must not report the parent's
+        # requests, nor write to its file
+        self._local = threading.local()
+        self._shards = []
+        self._last_flush = time.monotonic()
+        self._file = None
+
+    @property
+    def file_name(self):
+        if self._file is None:
+            self._file = f'{socket.gethostname()}-{os.getpid()}-{time.time_ns()}.json'
+        return self._file
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            # list.append is atomic; shards outlive their thread
+            self._shards.append(shard)
+        return shard
+
+    def observe(self, route, method, status, duration, size=None, queries=0, query_time=0.0):
+        shard = self._shard()
+        key = (route, method if method in METHODS else 'OTHER')
+        stats = shard.get(key)
+        if stats is None:
+            stats = shard[key] = RouteStats()
+        stats.count += 1
+        stats.duration_sum += duration
+        stats.buckets[bisect_left(BUCKETS, duration)] += 1
+        if size is not None:
+            stats.size_sum += size
+            stats.size_count += 1
+        stats.queries += queries
+        stats.query_time += query_time
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+        if self.directory and time.monotonic() - self._last_flush > self.flush_interval:
+            self._last_flush = time.monotonic()
+            self.flush()
+
+    def snapshot(self):
+        """
+        Totals of this process as ``{"route|method": stats dict}``
+        """
+        totals = {}
+        for shard in list(self._shards):
+            for (route, method), stats in list(shard.items()):
+                merge(totals, f'{route}|{method}', stats.as_dict())
+        return totals
+
+    def flush(self):
+        """
+        Write this process' totals where the other workers can read them;
+        processes that handled no request (management commands) write nothing
+        """
+        snapshot = self.snapshot()
+        if not snapshot:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, self.file_name)
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as stream:
+            json.dump(snapshot, stream)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """
+        Totals of every worker writing to the metrics directory, this
+        process included. Files left by workers gone for longer than the
+        retention are deleted.
+        """
+        totals = {}
+        for key, stats in self.snapshot().items():
+            merge(totals, key, stats)
+        if not self.directory or not os.path.isdir(self.directory):
+            return totals
+        expired = time.time() - self.flush_interval * self.retention_intervals
+        for name in os.listdir(self.directory):
+            if name == self._file or not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < expired:
+                    os.remove(path)
+                    continue
+                with open(path, encoding='utf-8') as stream:
+                    snapshot = json.load(stream)
+            except (OSError, ValueError):
+                continue
+            for key, stats in snapshot.items():
+                merge(totals, key, stats)
+        return totals
+
+
+def merge(totals, key, stats):
+    current = totals.get(key)
+    if current is None:
+        totals[key] = dict(
+            stats,
+            buckets=list(stats['buckets']),
+            statuses={str(status): count for status, count in stats['statuses'].items()},
+        )
+        return
+    for name in ('count', 'duration_sum', 'size_sum', 'size_count', 'queries', 'query_time'):
+        current[name] += stats[name]
+    current['buckets'] = [a + b for a, b in zip(current['buckets'], stats['buckets'])]
+    for status, count in stats['statuses'].items():
+        current['statuses'][str(status)] = current['statuses'].get(str(status), 0) + count
+
+
+def render(totals):
+    """
+    Format collected totals in the Prometheus text exposition format
+    """
+    rows = sorted((key.split('|', 1), stats) for key, stats in totals.items())
+    lines = []
+
+    def family(name, kind, description):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    family('shop_http_requests_total', 'counter', 'Requests handled, by route, method and status.')
+    for (route, method), stats in rows:
+        for status, count in sorted(stats['statuses'].items()):
+            lines.append(f'shop_http_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+
+    family('shop_http_request_duration_seconds', 'histogram', 'Time spent handling requests.')
+    for (route, method), stats in rows:
+        labels = f'route="{route}",method="{method}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, stats['buckets']):
+            cumulative += count
+            lines.append(f'shop_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'shop_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+        lines.append(f'shop_http_request_duration_seconds_sum{{{labels}}} {stats["duration_sum"]}')
+        lines.append(f'shop_http_request_duration_seconds_count{{{labels}}} {stats["count"]}')
+
+    family('shop_http_response_size_bytes', 'summary', 'Size of non-streaming response bodies.')
+    for (route, method), stats in rows:
+        labels = f'route="{route}",method="{method}"'
+        lines.append(f'shop_http_response_size_bytes_sum{{{labels}}} {stats["size_sum"]}')
+        lines.append(f'shop_http_response_size_bytes_count{{{labels}}} {stats["size_count"]}')
+
+    family('shop_db_queries_total', 'counter', 'Database queries issued while handling requests.')
+    for (route, method), stats in rows:
+        lines.append(f'shop_db_queries_total{{route="{route}",method="{method}"}} {stats["queries"]}')
+
+    family('shop_db_query_duration_seconds_total', 'counter', 'Time spent in database queries while handling requests.')
+    for (route, method), stats in rows:
+        lines.append(f'shop_db_query_duration_seconds_total{{route="{route}",method="{method}"}} {stats["query_time"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def start_query_recording():
+    """
+    Count the queries of the current request (including those run in
+    ``sync_to_async`` threads) and return the ``[count, seconds]`` holder
+    """
+    holder = [0, 0.0]
+    _request_queries.set(holder)
+    return holder
+
+
+def stop_query_recording():
+    _request_queries.set(None)
+
+
+def record_query(execute, sql, params, many, context):
+    holder = _request_queries.get()
+    if holder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        holder[0] += 1
+        holder[1] += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid='shop.metrics.install_query_recorder')
+
+registry = MetricsRegistry(
+    directory=getattr(settings, 'SHOP_METRICS_DIR', None),
+    flush_interval=getattr(settings, 'SHOP_METRICS_FLUSH_INTERVAL', 10),
+    retention_intervals=getattr(settings, 'SHOP_METRICS_RETENTION_INTERVALS', 360),
+)
+os.register_at_fork(after_in_child=registry._reset)
+
+
+@atexit.register
+def _flush_on_exit():
+    if registry.directory:
+        try:
+            registry.flush()
+        except OSError:
+            logger.exception('Could not write the request metrics on exit')
@@ -0,0 +1,186 @@
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .compression import compress, compress_cached, compress_stream, is_compressible, negotiate_encoding
+from .metrics import UNMATCHED_ROUTE, registry, start_query_recording, stop_query_recording
+from .routers import get_replicas, set_replica_reads
+
+
+PIN_COOKIE = 'shop_primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def should_use_replica(request):
+    """
+    Whether the reads of this request may be served by a read replica:
+    public catalog GETs (routes listed in SHOP_REPLICA_ROUTES) from clients
+    that are not authenticated and did not write within the last
+    SHOP_PRIMARY_PIN_SECONDS seconds
+    """
+    if not get_replicas() or request.method not in SAFE_METHODS:
+        return False
+    match = request.resolver_match
+    if match is None or match.url_name not in getattr(settings, 'SHOP_REPLICA_ROUTES', ()):
+        return False
+    if 'HTTP_AUTHORIZATION' in request.META:
+        return False
+    try:
+        return int(request.COOKIES.get(PIN_COOKIE, 0)) <= time.time()
+    except ValueError:
+        return True
+
+
+def _reset_after(content):
+    try:
+        yield from content
+    finally:
+        set_replica_reads(False)
+
+
+async def _areset_after(content):
+    try:
+        async for chunk in content:
+            yield chunk
+    finally:
+        set_replica_reads(False)
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Serve public catalog reads from the read replicas, and pin clients to
+    the primary for a while after they write so they read their own writes.
+    The pin is a fixed duration; the actual replica lag is not checked.
+
+    The routing only selects the database: the view still runs through the
+    regular handler (ATOMIC_REQUESTS, process_exception), and streamed
+    bodies keep reading from the replica until they are consumed.
+    """
+    def process_request(self, request):
+        # Whatever the previous request of this thread or task left
+        set_replica_reads(False)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Async views apply the same rule themselves (see shop.async_views)
+        if not iscoroutinefunction(view_func) and should_use_replica(request):
+            set_replica_reads(True)
+        return None
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and get_replicas():
+            pin = getattr(settings, 'SHOP_PRIMARY_PIN_SECONDS', 5)
+            response.set_cookie(PIN_COOKIE, str(int(time.time() + pin)), max_age=pin, httponly=True, samesite='Lax')
+        if not response.streaming:
+            set_replica_reads(False)
+        elif response.is_async:
+            response.streaming_content = _areset_after(response.streaming_content)
+        else:
+            response.streaming_content = _reset_after(response.streaming_content)
+        return response
+
+
+class AsgiUrlconfMiddleware(MiddlewareMixin):
+    """
+    Under an ASGI server, resolve URLs with SHOP_ASGI_URLCONF so the public
+    catalog endpoints are served by their async variants
+    """
+    def process_request(self, request):
+        urlconf = getattr(settings, 'SHOP_ASGI_URLCONF', None)
+        if urlconf and isinstance(request, ASGIRequest):
+            request.urlconf = urlconf
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Record latency, queries, response size and status of every request per
+    URL name (see shop.metrics)
+    """
+    def process_request(self, request):
+        request._metrics_started = time.perf_counter()
+        request._metrics_queries = start_query_recording()
+
+    def process_response(self, request, response):
+        started = getattr(request, '_metrics_started', None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        stop_query_recording()
+
+        match = getattr(request, 'resolver_match', None)
+        queries, query_time = request._metrics_queries
+        registry.observe(
+            match.url_name if match is not None and match.url_name else UNMATCHED_ROUTE,
+            request.method,
+            response.status_code,
+            duration,
+            # Streamed bodies are produced after the response leaves the stack
+            size=None if response.streaming else len(response.content),
+            queries=queries,
+            query_time=query_time,
+        )
+        return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress text and JSON responses with the best encoding the client
+    accepts (see shop.compression). Bodies of the routes listed in
+    SHOP_COMPRESSION_CACHED_ROUTES are compressed once per catalog version.
+    """
+    def process_response(self, request, response):
+        if response.status_code == 304:
+            return self.not_modified(request, response)
+        if response.has_header('Content-Encoding') or not is_compressible(response):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'SHOP_COMPRESSION_MIN_SIZE', 200):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                return response
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            match = request.resolver_match
+            cached = (
+                request.method == 'GET'
+                and response.status_code == 200
+                and match is not None
+                and match.url_name in getattr(settings, 'SHOP_COMPRESSION_CACHED_ROUTES', ())
+                and len(response.content) >= getattr(settings, 'SHOP_COMPRESSION_CACHE_MIN_SIZE', 8192)
+            )
+            if cached:
+                compressed = compress_cached(request, response, encoding)
+            else:
+                compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The ETag no longer identifies the exact bytes sent
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def not_modified(self, request, response):
+        """
+        A 304 has no body to compress but must carry the ETag and Vary the
+        compressed 200 would, so caches keep a consistent validator
+        """
+        patch_vary_headers(response, ('Accept-Encoding',))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"') and negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            response.headers['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50, verbose_name='Modèle')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name="Identifiant de l'objet")),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de suppression')),
+            ],
+            options={
+                'verbose_name': 'Suppression',
+                'verbose_name_plural': 'Suppressions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='boutique',
+            index=models.Index(fields=['updated_at'], name='shop_boutiq_updated_060768_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['updated_at'], name='shop_catego_updated_d9241a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='companyconfig',
+            index=models.Index(fields=['updated_at'], name='shop_compan_updated_d09aa4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at'], name='shop_produc_updated_48807c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slider',
+            index=models.Index(fields=['updated_at'], name='shop_slider_updated_72ab41_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedrecord',
+            index=models.Index(fields=['deleted_at', 'model_name'], name='shop_delete_deleted_6898a5_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['boutique', 'created_at', 'id'], name='shop_catego_boutiqu_0cb19a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='shop_produc_created_467304_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='shop_produc_price_5e650a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['boutique', 'created_at', 'id'], name='shop_produc_boutiqu_3931e7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['boutique', 'price', 'id'], name='shop_produc_boutiqu_1e7378_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+from django.db import migrations
+
+
+# Accent folding (remove_diacritics) and prefix indexes for the French catalog
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE shop_product_fts USING fts5(
+        title, description, boutique_name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO shop_product_fts (rowid, title, description, boutique_name)
+    SELECT p.id, p.title, p.description, b.name
+    FROM shop_product p JOIN shop_boutique b ON b.id = p.boutique_id
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_insert AFTER INSERT ON shop_product BEGIN
+        INSERT INTO shop_product_fts (rowid, title, description, boutique_name)
+        VALUES (new.id, new.title, new.description,
+                (SELECT name FROM shop_boutique WHERE id = new.boutique_id));
+    END
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_update AFTER UPDATE OF title, description, boutique_id ON shop_product BEGIN
+        DELETE FROM shop_product_fts WHERE rowid = old.id;
+        INSERT INTO shop_product_fts (rowid, title, description, boutique_name)
+        VALUES (new.id, new.title, new.description,
+                (SELECT name FROM shop_boutique WHERE id = new.boutique_id));
+    END
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_delete AFTER DELETE ON shop_product BEGIN
+        DELETE FROM shop_product_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER shop_boutique_fts_rename AFTER UPDATE OF name ON shop_boutique BEGIN
+        UPDATE shop_product_fts SET boutique_name = new.name
+        WHERE rowid IN (SELECT id FROM shop_product WHERE boutique_id = new.id);
+    END
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS shop_boutique_fts_rename',
+    'DROP TRIGGER IF EXISTS shop_product_fts_delete',
+    'DROP TRIGGER IF EXISTS shop_product_fts_update',
+    'DROP TRIGGER IF EXISTS shop_product_fts_insert',
+    'DROP TABLE IF EXISTS shop_product_fts',
+]
+
+
+def _run(statements):
+    def operation(apps, schema_editor):
+        # The full-text index is SQLite specific; other databases fall back
+        # to LIKE lookups in shop.search
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_product_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock'], name='shop_produc_stock_da91c6_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:11
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+product_fts = import_module('shop.migrations.0004_product_fts')
+
+# SQLite rebuilds shop_boutique to add a column, and the rename at the end
+# of the rebuild fails while the full-text triggers reference the table
+FTS_TRIGGERS = [statement for statement in product_fts.CREATE_SQL if 'CREATE TRIGGER' in statement]
+DROP_FTS_TRIGGERS = [statement for statement in product_fts.DROP_SQL if 'DROP TRIGGER' in statement]
+
+
+def count_products(apps, schema_editor):
+    for name in ('Boutique', 'Category'):
+        model = apps.get_model('shop', name)
+        counts = model.objects.filter(pk=OuterRef('pk')).annotate(actual=Count('products')).values('actual')
+        model.objects.update(product_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.RunPython(product_fts._run(DROP_FTS_TRIGGERS), product_fts._run(FTS_TRIGGERS)),
+        migrations.AddField(
+            model_name='boutique',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nombre de produits'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nombre de produits'),
+        ),
+        migrations.RunPython(product_fts._run(FTS_TRIGGERS), product_fts._run(DROP_FTS_TRIGGERS)),
+        migrations.RunPython(count_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:46
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+product_fts = import_module('shop.migrations.0004_product_fts')
+
+# Adding a column rebuilds the table on SQLite, see 0007_product_counters
+FTS_TRIGGERS = [statement for statement in product_fts.CREATE_SQL if 'CREATE TRIGGER' in statement]
+DROP_FTS_TRIGGERS = [statement for statement in product_fts.DROP_SQL if 'DROP TRIGGER' in statement]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_product_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(product_fts._run(DROP_FTS_TRIGGERS), product_fts._run(FTS_TRIGGERS)),
+        migrations.AddField(
+            model_name='boutique',
+            name='image_derivatives',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Déclinaisons générées'),
+        ),
+        migrations.AddField(
+            model_name='companyconfig',
+            name='logo_derivatives',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Déclinaisons générées'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_derivatives',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Déclinaisons générées'),
+        ),
+        migrations.AddField(
+            model_name='slider',
+            name='image_derivatives',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Déclinaisons générées'),
+        ),
+        migrations.RunPython(product_fts._run(FTS_TRIGGERS), product_fts._run(DROP_FTS_TRIGGERS)),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:57
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+from shop.images import IMAGE_FIELDS, has_derivatives, mark_derivatives
+
+product_fts = import_module('shop.migrations.0004_product_fts')
+
+# Altering a column rebuilds the table on SQLite, see 0007_product_counters
+FTS_TRIGGERS = [statement for statement in product_fts.CREATE_SQL if 'CREATE TRIGGER' in statement]
+DROP_FTS_TRIGGERS = [statement for statement in product_fts.DROP_SQL if 'DROP TRIGGER' in statement]
+
+
+def record_rendition_widths(apps, schema_editor):
+    # Renditions are named after the full source name now, so those
+    # generated before are ignored until generate_image_derivatives runs
+    for label, field_name in IMAGE_FIELDS.items():
+        model = apps.get_model(label)
+        names = set(model.objects.exclude(**{field_name: ''}).values_list(field_name, flat=True))
+        mark_derivatives(model, field_name, {name: has_derivatives(name) for name in names if name})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.RunPython(product_fts._run(DROP_FTS_TRIGGERS), product_fts._run(FTS_TRIGGERS)),
+        migrations.AlterField(
+            model_name='boutique',
+            name='image_derivatives',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Largeur des déclinaisons'),
+        ),
+        migrations.AlterField(
+            model_name='companyconfig',
+            name='logo_derivatives',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Largeur des déclinaisons'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image_derivatives',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Largeur des déclinaisons'),
+        ),
+        migrations.AlterField(
+            model_name='slider',
+            name='image_derivatives',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Largeur des déclinaisons'),
+        ),
+        migrations.RunPython(product_fts._run(FTS_TRIGGERS), product_fts._run(DROP_FTS_TRIGGERS)),
+        migrations.RunPython(record_rendition_widths, migrations.RunPython.noop),
+    ]
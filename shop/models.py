@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
@@ -68,6 +70,8 @@ class CompanyConfig(models.Model):
     address = models.TextField(verbose_name="Adresse de l'entreprise")
     email = models.EmailField(blank=True, null=True, verbose_name="Email de contact")
     logo = models.ImageField(upload_to='company_logos/', blank=True, null=True, verbose_name="Logo de l'entreprise")
+    # Width of the largest resized rendition, 0 until they exist (see shop.images)
+    logo_derivatives = models.PositiveIntegerField(default=0, editable=False, verbose_name="Largeur des déclinaisons")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -77,6 +81,7 @@ class CompanyConfig(models.Model):
     class Meta:
         verbose_name = "Configuration de l'entreprise"
         verbose_name_plural = "Configurations des entreprises"
+        indexes = [models.Index(fields=['updated_at'])]
 
 
 class Boutique(models.Model):
@@ -85,8 +90,12 @@ class Boutique(models.Model):
     """
     name = models.CharField(max_length=100, verbose_name="Nom de la boutique")
     image = models.ImageField(upload_to='boutique_images/', verbose_name="Image d'illustration")
+    # Width of the largest resized rendition, 0 until they exist (see shop.images)
+    image_derivatives = models.PositiveIntegerField(default=0, editable=False, verbose_name="Largeur des déclinaisons")
     description = models.TextField(verbose_name="Description de la boutique")
     owner = models.OneToOneField(VendorUser, on_delete=models.CASCADE, related_name='boutique', null=True, blank=True, verbose_name="Propriétaire de la boutique")
+    # Maintained by the signal handlers and bulk writers (see shop.counters)
+    product_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Nombre de produits")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -96,6 +105,7 @@ class Boutique(models.Model):
     class Meta:
         verbose_name = "Boutique"
         verbose_name_plural = "Boutiques"
+        indexes = [models.Index(fields=['updated_at'])]
 
 
 class Category(models.Model):
@@ -105,6 +115,8 @@ class Category(models.Model):
     name = models.CharField(max_length=100, verbose_name="Nom de la catégorie")
     description = models.TextField(blank=True, null=True, verbose_name="Description de la catégorie")
     boutique = models.ForeignKey(Boutique, on_delete=models.CASCADE, related_name='categories', verbose_name="Boutique associée")
+    # Maintained by the signal handlers and bulk writers (see shop.counters)
+    product_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Nombre de produits")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -114,6 +126,11 @@ class Category(models.Model):
     class Meta:
         verbose_name = "Catégorie"
         verbose_name_plural = "Catégories"
+        indexes = [
+            models.Index(fields=['updated_at']),
+            # Keyset pagination of the vendor category list
+            models.Index(fields=['boutique', 'created_at', 'id']),
+        ]
 
 
 class Product(models.Model):
@@ -124,6 +141,8 @@ class Product(models.Model):
     description = models.TextField(verbose_name="Description du produit")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Prix")
     image = models.ImageField(upload_to='product_images/', verbose_name="Image du produit")
+    # Width of the largest resized rendition, 0 until they exist (see shop.images)
+    image_derivatives = models.PositiveIntegerField(default=0, editable=False, verbose_name="Largeur des déclinaisons")
     stock = models.PositiveIntegerField(verbose_name="Stock disponible")
     boutique = models.ForeignKey(
         Boutique,
@@ -141,6 +160,16 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Produit"
         verbose_name_plural = "Produits"
+        indexes = [
+            models.Index(fields=['updated_at']),
+            # Keyset pagination of the public and vendor product lists
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['boutique', 'created_at', 'id']),
+            models.Index(fields=['boutique', 'price', 'id']),
+            # Public catalog stock filter
+            models.Index(fields=['stock']),
+        ]
 
 
 class Slider(models.Model):
@@ -148,6 +177,8 @@ class Slider(models.Model):
     Home page slider images with title and description
     """
     image = models.ImageField(upload_to='slider_images/', verbose_name="Image du slider")
+    # Width of the largest resized rendition, 0 until they exist (see shop.images)
+    image_derivatives = models.PositiveIntegerField(default=0, editable=False, verbose_name="Largeur des déclinaisons")
     title = models.CharField(max_length=200, verbose_name="Titre")
     description = models.TextField(verbose_name="Description")
     order = models.PositiveIntegerField(default=0, help_text="Ordre d'affichage")
@@ -161,3 +192,65 @@ class Slider(models.Model):
         verbose_name = "Slider"
         verbose_name_plural = "Sliders"
         ordering = ['order']
+        indexes = [models.Index(fields=['updated_at'])]
+
+
+class DeletedRecord(models.Model):
+    """
+    Tombstone recorded when a synced catalog row is deleted
+    """
+    model_name = models.CharField(max_length=50, verbose_name="Modèle")
+    object_id = models.PositiveBigIntegerField(verbose_name="Identifiant de l'objet")
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de suppression")
+
+    def __str__(self):
+        return f'{self.model_name} #{self.object_id}'
+
+    class Meta:
+        verbose_name = "Suppression"
+        verbose_name_plural = "Suppressions"
+        indexes = [models.Index(fields=['deleted_at', 'model_name'])]
+
+
+class StockReservation(models.Model):
+    """
+    Time-limited hold on product stock for a checkout in progress
+    """
+    ACTIVE = 'active'
+    CONFIRMED = 'confirmed'
+    RELEASED = 'released'
+    STATUS_CHOICES = [
+        (ACTIVE, 'Active'),
+        (CONFIRMED, 'Confirmée'),
+        (RELEASED, 'Libérée'),
+    ]
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False, verbose_name="Jeton")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=ACTIVE, verbose_name="Statut")
+    expires_at = models.DateTimeField(verbose_name="Date d'expiration")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return str(self.token)
+
+    class Meta:
+        verbose_name = "Réservation de stock"
+        verbose_name_plural = "Réservations de stock"
+        indexes = [models.Index(fields=['status', 'expires_at'])]
+
+
+class StockReservationItem(models.Model):
+    """
+    Quantity of a product held by a reservation
+    """
+    reservation = models.ForeignKey(StockReservation, on_delete=models.CASCADE, related_name='items', verbose_name="Réservation")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservation_items', verbose_name="Produit")
+    quantity = models.PositiveIntegerField(verbose_name="Quantité")
+
+    def __str__(self):
+        return f'{self.product_id} x {self.quantity}'
+
+    class Meta:
+        verbose_name = "Article réservé"
+        verbose_name_plural = "Articles réservés"
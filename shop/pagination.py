@@ -0,0 +1,117 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Keyset pagination for large product and category lists: pages are
+    located with an indexed ``WHERE (created_at, id) < cursor`` instead of
+    an OFFSET, and no COUNT(*) query is issued. Lists can also be ordered by
+    price through ``?ordering=price`` / ``?ordering=-price``.
+
+    DRF's CursorPagination positions on the first ordering field only and
+    skips ties with an OFFSET capped at ``offset_cutoff``; here the cursor
+    holds that field and the id of the last row, so any number of products
+    sharing a price or a timestamp is paged through without an OFFSET.
+    """
+    page_size = 20
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        # The keyset is the first field then the id, in the same direction
+        field = ordering[0]
+        if field.lstrip('-') in ('id', 'pk'):
+            return (field,)
+        return (field, '-id' if field.startswith('-') else 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request, queryset.model)
+        reverse = self.cursor is not None and self.cursor[2]
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.after(ordering, *self.cursor[:2]))
+
+        # One extra row tells whether a page follows
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next, self.has_previous = has_following, self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def after(self, ordering, value, pk):
+        """
+        Rows strictly after ``(value, pk)`` in ``ordering``
+        """
+        field = ordering[0].lstrip('-')
+        lookup = 'lt' if ordering[0].startswith('-') else 'gt'
+        if field in ('id', 'pk'):
+            return Q(**{f'pk__{lookup}': pk})
+        # The redundant bound lets the (field, id) index be range scanned
+        bound = Q(**{f'{field}__{lookup}e': value})
+        return bound & (Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': pk}))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        # Past the last row, the previous page ends at the current cursor
+        return self.encode_cursor(self.page[0] if self.page else None, reverse=True)
+
+    def encode_cursor(self, instance, reverse=False):
+        if instance is None:
+            value, pk = self.cursor[:2]
+        else:
+            value, pk = getattr(instance, self.ordering[0].lstrip('-')), instance.pk
+        tokens = {'p': str(value), 'i': str(pk)}
+        if reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(parse.urlencode(tokens).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model=None):
+        """
+        ``(value, pk, reverse)`` of the cursor in ``request``, or None
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            querystring = b64decode(encoded.encode('ascii'), validate=True).decode('ascii')
+            tokens = parse.parse_qs(querystring, strict_parsing=True)
+            pk = int(tokens['i'][0])
+            field = self.ordering[0].lstrip('-')
+            value = pk if field in ('id', 'pk') else model._meta.get_field(field).clean(tokens['p'][0], None)
+            if value is None or not 0 < pk < 2 ** 63:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, tokens.get('r') == ['1']
@@ -0,0 +1,101 @@
+import re
+from collections import Counter
+from decimal import Decimal
+from urllib.parse import quote
+
+from .models import CompanyConfig, Product
+
+
+CENTS = Decimal('0.01')
+
+
+def _money(value):
+    return str(value.quantize(CENTS))
+
+
+def build_whatsapp_message(boutiques, total):
+    """
+    Pre-filled WhatsApp order message, grouped by boutique
+    """
+    lines = ['Bonjour, je souhaite commander :']
+    for boutique in boutiques:
+        lines.append('')
+        lines.append(f"*{boutique['name']}*")
+        for line in boutique['lines']:
+            lines.append(f"- {line['quantity']} x {line['title']} ({line['unit_price']}) = {line['line_total']}")
+        lines.append(f"Sous-total : {boutique['subtotal']}")
+    lines.append('')
+    lines.append(f'Total : {_money(total)}')
+    return '\n'.join(lines)
+
+
+def build_quote(items):
+    """
+    Price a cart of ``(product_id, quantity)`` pairs server side: products
+    and their boutiques come from a single ``in_bulk`` query. Returns
+    per-line and per-boutique totals, stock availability and the WhatsApp
+    order message.
+    """
+    quantities = Counter()
+    for product_id, quantity in items:
+        quantities[product_id] += quantity
+
+    products = Product.objects.select_related('boutique').only(
+        'id', 'title', 'price', 'stock', 'boutique__id', 'boutique__name'
+    ).in_bulk(list(quantities))
+
+    lines = []
+    boutiques = {}
+    total = Decimal('0')
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        line_total = product.price * quantity
+        total += line_total
+        line = {
+            'product': product.pk,
+            'title': product.title,
+            'boutique': product.boutique_id,
+            'quantity': quantity,
+            'unit_price': _money(product.price),
+            'line_total': _money(line_total),
+            'stock': product.stock,
+            'available': product.stock >= quantity,
+        }
+        lines.append(line)
+
+        boutique = boutiques.setdefault(product.boutique_id, {
+            'id': product.boutique_id,
+            'name': product.boutique.name,
+            'subtotal': Decimal('0'),
+            'lines': [],
+        })
+        boutique['subtotal'] += line_total
+        boutique['lines'].append(line)
+
+    boutique_totals = [
+        dict(boutique, subtotal=_money(boutique['subtotal']))
+        for boutique in boutiques.values()
+    ]
+
+    config = CompanyConfig.objects.only('whatsapp_number').first()
+    whatsapp_number = config.whatsapp_number if config else None
+    message = build_whatsapp_message(boutique_totals, total)
+    whatsapp_url = None
+    if whatsapp_number:
+        whatsapp_url = 'https://wa.me/%s?text=%s' % (re.sub(r'\D', '', whatsapp_number), quote(message))
+
+    return {
+        'lines': lines,
+        'boutiques': [
+            {key: value for key, value in boutique.items() if key != 'lines'}
+            for boutique in boutique_totals
+        ],
+        'missing': [product_id for product_id in quantities if product_id not in products],
+        'total': _money(total),
+        'available': all(line['available'] for line in lines) and len(lines) == len(quantities),
+        'whatsapp_number': whatsapp_number,
+        'whatsapp_message': message,
+        'whatsapp_url': whatsapp_url,
+    }
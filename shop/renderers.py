@@ -0,0 +1,58 @@
+import json
+from itertools import islice
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+
+def iter_serialized_chunks(queryset, serializer_class, chunk_size, selection=None):
+    """
+    Iterate ``queryset`` with a server-side cursor and yield lists of
+    serialized rows (restricted to ``selection`` if given), ``chunk_size``
+    rows at a time, so memory stays flat regardless of the table size
+    """
+    iterator = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield serializer_class(chunk, many=True, selection=selection).data
+
+
+def _dumps(item):
+    return json.dumps(item, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON: one object per line
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(self.render_stream([data if isinstance(data, list) else [data]]))
+
+    def render_stream(self, chunks):
+        for chunk in chunks:
+            if chunk:
+                yield ''.join(_dumps(item) + '\n' for item in chunk).encode('utf-8')
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """
+    JSON renderer that can also stream a list as a JSON array, chunk by chunk
+    """
+    def render_stream(self, chunks):
+        yield b'['
+        first = True
+        for chunk in chunks:
+            if not chunk:
+                continue
+            body = ','.join(_dumps(item) for item in chunk)
+            yield (body if first else ',' + body).encode('utf-8')
+            first = False
+        yield b']'
@@ -0,0 +1,100 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Product, StockReservation, StockReservationItem
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id):
+        super().__init__(product_id)
+        self.product_id = product_id
+
+
+def _schedule_catalog_bump():
+    # Stock is part of the cached catalog; queryset updates send no signals
+    transaction.on_commit(bump_catalog_version)
+
+
+def _adjust_stock(product_id, delta):
+    return Product.objects.filter(pk=product_id).update(stock=F('stock') + delta, updated_at=timezone.now())
+
+
+def reserve_stock(items):
+    """
+    Hold ``items`` (an iterable of ``(product_id, quantity)``) for a whole
+    cart in one transaction. Each line is a conditional
+    ``UPDATE ... SET stock = stock - qty WHERE stock >= qty``, so concurrent
+    checkouts can never oversell; if any line fails the whole cart is rolled
+    back and InsufficientStock is raised.
+    """
+    release_expired_reservations()
+
+    quantities = Counter()
+    for product_id, quantity in items:
+        quantities[product_id] += quantity
+
+    ttl = getattr(settings, 'SHOP_RESERVATION_TTL', 15 * 60)
+    with transaction.atomic():
+        # Always lock rows in the same order to avoid deadlocks on databases
+        # with row locks
+        for product_id in sorted(quantities):
+            quantity = quantities[product_id]
+            updated = Product.objects.filter(pk=product_id, stock__gte=quantity).update(
+                stock=F('stock') - quantity, updated_at=timezone.now()
+            )
+            if not updated:
+                raise InsufficientStock(product_id)
+
+        reservation = StockReservation.objects.create(expires_at=timezone.now() + timedelta(seconds=ttl))
+        StockReservationItem.objects.bulk_create([
+            StockReservationItem(reservation=reservation, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities.items()
+        ])
+        _schedule_catalog_bump()
+    return reservation
+
+
+def release_reservation(reservation_id):
+    """
+    Give the stock of an active reservation back. Returns False when the
+    reservation was already confirmed or released.
+    """
+    with transaction.atomic():
+        # Claim the reservation first so two releases can't both restock it
+        claimed = StockReservation.objects.filter(pk=reservation_id, status=StockReservation.ACTIVE).update(
+            status=StockReservation.RELEASED, updated_at=timezone.now()
+        )
+        if not claimed:
+            return False
+        for product_id, quantity in StockReservationItem.objects.filter(
+            reservation_id=reservation_id
+        ).values_list('product_id', 'quantity'):
+            _adjust_stock(product_id, quantity)
+        _schedule_catalog_bump()
+    return True
+
+
+def confirm_reservation(reservation_id):
+    """
+    Turn an active, unexpired reservation into a sale: the stock stays
+    decremented
+    """
+    return bool(StockReservation.objects.filter(
+        pk=reservation_id, status=StockReservation.ACTIVE, expires_at__gt=timezone.now()
+    ).update(status=StockReservation.CONFIRMED, updated_at=timezone.now()))
+
+
+def release_expired_reservations():
+    """
+    Release every active reservation past its expiry date
+    """
+    expired = StockReservation.objects.filter(
+        status=StockReservation.ACTIVE, expires_at__lte=timezone.now()
+    ).values_list('pk', flat=True)
+    return sum(release_reservation(pk) for pk in list(expired))
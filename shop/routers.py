@@ -0,0 +1,62 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+_use_replica = ContextVar('shop_use_replica', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'SHOP_READ_REPLICAS', [])
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """
+    Route the reads made inside the block to a read replica (when enabled
+    and replicas are configured) or to the primary
+    """
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def use_primary():
+    return use_replica(False)
+
+
+def set_replica_reads(enabled):
+    """
+    Route the reads of the current request until changed again; unlike
+    ``use_replica``, it can outlive a block (streamed bodies are produced
+    after the view returns)
+    """
+    _use_replica.set(enabled)
+
+
+class ReadReplicaRouter:
+    """
+    Send reads to one of SHOP_READ_REPLICAS while ``use_replica`` is active
+    (public catalog requests, see ReplicaRoutingMiddleware); everything else
+    goes to the primary.
+    """
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if replicas and _use_replica.get():
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and are never migrated directly
+        return db not in get_replicas()
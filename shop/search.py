@@ -0,0 +1,58 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.db import connections
+from django.db.models import Q
+
+
+FTS_TABLE = 'shop_product_fts'
+
+# Column weights for bm25(): title, description, boutique name
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query where every word must match as a
+    prefix, e.g. ``tel sams`` -> ``"tel"* "sams"*``. Returns None when the
+    text contains no searchable word.
+    """
+    words = WORD_RE.findall(text or '')
+    if not words:
+        return None
+    return ' '.join('"%s"*' % word for word in words)
+
+
+def fts_available(using):
+    return connections[using].vendor == 'sqlite'
+
+
+def search_products(queryset, text):
+    """
+    Filter a Product queryset to the rows matching ``text``, best matches
+    first. Uses the FTS5 index on SQLite and falls back to ``icontains``
+    lookups on other databases.
+    """
+    words = WORD_RE.findall(text or '')
+    if not words:
+        return queryset.none()
+
+    if not fts_available(queryset.db):
+        return queryset.filter(reduce(and_, (
+            reduce(or_, (Q(title__icontains=word), Q(description__icontains=word), Q(boutique__name__icontains=word)))
+            for word in words
+        ))).order_by('-created_at', '-id')
+
+    match = build_match_query(text)
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    # Join the FTS table so the MATCH runs once; a correlated bm25()
+    # subquery would rerun it for every matching product
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = shop_product.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+        select={'search_rank': f'bm25({FTS_TABLE}, {weights})'},
+    ).order_by('search_rank', '-id')
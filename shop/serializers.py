@@ -1,9 +1,108 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import authenticate
-from .models import CompanyConfig, Boutique, Slider, Product, Category, VendorUser
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from .images import derivatives_field, srcset
+from .models import CompanyConfig, Boutique, Slider, Product, Category, VendorUser, StockReservation, StockReservationItem
 
 
-class VendorUserSerializer(serializers.ModelSerializer):
+# Largest primary key (BigAutoField); bigger ids overflow in the database
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_field_paths(values):
+    """
+    Turn ``["id,title", "categories.name"]`` into the tree
+    ``{"id": {}, "title": {}, "categories": {"name": {}}}``
+    """
+    tree = {}
+    for value in values:
+        for path in value.split(','):
+            node = tree
+            for name in path.strip().split('.'):
+                if name:
+                    node = node.setdefault(name, {})
+    return tree
+
+
+class FieldSelection:
+    """
+    Fields (``None`` for all of them) and expanded relations requested for
+    one serializer level, from ``?fields=`` and ``?expand=``. Both accept
+    comma separated names, dotted for nested serializers:
+    ``?fields=id,name,products.title&expand=products``.
+    """
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand or {}
+
+    @classmethod
+    def from_request(cls, request):
+        """
+        Selection requested by a read request, or None when the client
+        asked for the full representation
+        """
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        params = getattr(request, 'query_params', request.GET)
+        fields = parse_field_paths(params.getlist('fields'))
+        expand = parse_field_paths(params.getlist('expand'))
+        if not fields and not expand:
+            return None
+        return cls(fields or None, expand)
+
+    def nested(self, name):
+        fields = self.fields.get(name) if self.fields is not None else None
+        return FieldSelection(fields or None, self.expand.get(name))
+
+
+class SparseFieldsMixin:
+    """
+    Serializer honouring a FieldSelection: unselected fields are dropped,
+    and the relations listed in ``Meta.expandable`` are rendered as ids
+    unless expanded. The selection is given as ``selection=`` or read from
+    the request in the context; without one the serializer renders every
+    field and embeds its relations as before.
+    """
+    def __init__(self, *args, selection=None, **kwargs):
+        self.selection = selection
+        super().__init__(*args, **kwargs)
+
+    def get_selection(self):
+        if self.selection is not None:
+            return self.selection
+        root = self.root
+        if root is self or getattr(root, 'child', None) is self:
+            return FieldSelection.from_request(self.context.get('request'))
+        return None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.get_selection()
+        if selection is None:
+            return fields
+
+        if selection.fields is not None:
+            fields = {
+                name: field for name, field in fields.items() if name in selection.fields or field.write_only
+            }
+        expandable = getattr(self.Meta, 'expandable', ())
+        for name, field in list(fields.items()):
+            nested = getattr(field, 'child', field)
+            if not isinstance(nested, SparseFieldsMixin):
+                continue
+            if name in expandable and name not in selection.expand:
+                kwargs = {'source': field.source} if field.source not in (None, name) else {}
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=isinstance(field, serializers.ListSerializer), read_only=True, **kwargs
+                )
+            else:
+                nested.selection = selection.nested(name)
+        return fields
+
+
+class VendorUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
@@ -48,13 +147,105 @@ class LoginSerializer(serializers.Serializer):
         return attrs
 
 
-class CategorySerializer(serializers.ModelSerializer):
+def plan_queryset(queryset, serializer_class, selection=None, keep=()):
+    """
+    Apply the relations declared in ``serializer_class.Meta`` (``select_related``
+    and ``prefetch_related``) to ``queryset``, recursing into nested serializers
+    so that serializing the result runs a constant number of queries.
+
+    With a FieldSelection, only the relations still rendered are loaded, and
+    restricted fieldsets load their columns (plus ``keep``) through
+    ``.only()``.
+    """
+    meta = serializer_class.Meta
+    select_related = getattr(meta, 'select_related', ())
+    prefetch_related = getattr(meta, 'prefetch_related', ())
+    if selection is None and not select_related and not prefetch_related:
+        return queryset
+
+    fields = serializer_class(selection=selection).fields
+    select_related = [name for name in select_related if name in fields]
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+
+    lookups = []
+    for name in prefetch_related:
+        field = fields.get(name)
+        if field is None:
+            continue
+        nested = getattr(field, 'child', field)
+        relation = meta.model._meta.get_field(field.source)
+        # Reverse foreign keys are matched to their parent on the foreign key
+        nested_keep = (relation.field.name,) if relation.one_to_many else ()
+        if isinstance(nested, serializers.ModelSerializer):
+            nested_queryset = nested.Meta.model._default_manager.all()
+            lookups.append(Prefetch(field.source, queryset=plan_queryset(
+                nested_queryset, type(nested), getattr(nested, 'selection', None), nested_keep
+            )))
+        elif selection is not None:
+            # Relation collapsed to ids
+            nested_queryset = relation.related_model._default_manager.only('pk', *nested_keep)
+            lookups.append(Prefetch(field.source, queryset=nested_queryset))
+        else:
+            lookups.append(name)
+    if lookups:
+        queryset = queryset.prefetch_related(*lookups)
+
+    if selection is not None and selection.fields is not None:
+        columns = selected_columns(meta.model, fields.values())
+        if columns is not None:
+            queryset = queryset.only('pk', *keep, *columns)
+    return queryset
+
+
+def selected_columns(model, fields):
+    """
+    Model fields read by the readable ``fields``, or None when one of them
+    reads something other than a column (a property, the whole object)
+    """
+    columns = []
+    for field in fields:
+        if field.write_only:
+            continue
+        if isinstance(field, ImageSrcsetField):
+            columns += [field.source, derivatives_field(field.source)]
+            continue
+        name = field.source.split('.', 1)[0]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if model_field.concrete and not model_field.many_to_many:
+            columns.append(name)
+        elif not model_field.is_relation:
+            return None
+    return columns
+
+
+class ImageSrcsetField(serializers.Field):
+    """
+    Read-only map of the resized WebP/JPEG renditions of an image field,
+    built from the rendition width recorded on the row
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return super().get_attribute(instance), getattr(instance, derivatives_field(self.source))
+
+    def to_representation(self, value):
+        image, largest = value
+        return srcset(image.name if image else None, largest, self.context.get('request'))
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     categories = CategorySerializer(many=True, read_only=True)
     category_ids = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -62,29 +253,131 @@ class ProductSerializer(serializers.ModelSerializer):
         write_only=True,
         source='categories'
     )
+    image_srcset = ImageSrcsetField(source='image')
 
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ('image_derivatives',)
+        prefetch_related = ('categories',)
+        expandable = ('categories',)
 
 
-class BoutiqueSerializer(serializers.ModelSerializer):
+class BoutiqueSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     owner = VendorUserSerializer(read_only=True)
     products = ProductSerializer(many=True, read_only=True)
     categories = CategorySerializer(many=True, read_only=True)
+    image_srcset = ImageSrcsetField(source='image')
 
     class Meta:
         model = Boutique
-        fields = '__all__'
+        exclude = ('image_derivatives',)
+        select_related = ('owner',)
+        prefetch_related = ('products', 'categories')
+        expandable = ('products', 'categories')
 
 
-class CompanyConfigSerializer(serializers.ModelSerializer):
+class CompanyConfigSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    logo_srcset = ImageSrcsetField(source='logo')
+
     class Meta:
         model = CompanyConfig
-        fields = '__all__'
+        exclude = ('logo_derivatives',)
 
 
-class SliderSerializer(serializers.ModelSerializer):
+class SliderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField(source='image')
+
     class Meta:
         model = Slider
-        fields = '__all__'
\ No newline at end of file
+        exclude = ('image_derivatives',)
+
+
+class BoutiqueSyncSerializer(BoutiqueSerializer):
+    """
+    Boutique without its products and categories, which delta sync sends separately
+    """
+    products = None
+    categories = None
+
+    class Meta(BoutiqueSerializer.Meta):
+        prefetch_related = ()
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """
+    One row of a bulk product import file
+    """
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(allow_blank=True, default='')
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock = serializers.IntegerField(min_value=0)
+    image = serializers.CharField(max_length=100, allow_blank=True, default='')
+    categories = serializers.ListField(child=serializers.CharField(max_length=100), default=list)
+    boutique = serializers.IntegerField(required=False)
+
+
+class CartItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+    quantity = serializers.IntegerField(min_value=1, max_value=getattr(settings, 'SHOP_CART_MAX_QUANTITY', 10000))
+
+
+class CartSerializer(serializers.Serializer):
+    """
+    Cart sent by the app for stock reservations and quotes. Lines of the
+    same product are merged.
+    """
+    items = CartItemSerializer(many=True, allow_empty=False, max_length=getattr(settings, 'SHOP_CART_MAX_ITEMS', 100))
+
+    def validate_items(self, items):
+        limit = getattr(settings, 'SHOP_CART_MAX_QUANTITY', 10000)
+        quantities = {}
+        for item in items:
+            quantities[item['product']] = quantities.get(item['product'], 0) + item['quantity']
+            if quantities[item['product']] > limit:
+                raise serializers.ValidationError(f'Au plus {limit} unités par produit.')
+        return [{'product': product, 'quantity': quantity} for product, quantity in quantities.items()]
+
+
+class StockReservationItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = StockReservationItem
+        fields = ('product', 'quantity')
+
+
+class StockReservationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    items = StockReservationItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = StockReservation
+        fields = ('token', 'status', 'expires_at', 'items')
+        prefetch_related = ('items',)
+
+
+class ProductBulkWriteSerializer(serializers.Serializer):
+    """
+    One product create or partial update in a vendor bulk request; images
+    are given as storage paths of already uploaded files
+    """
+    id = serializers.IntegerField(min_value=1, max_value=MAX_ID, required=False)
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(allow_blank=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock = serializers.IntegerField(min_value=0, max_value=2 ** 31 - 1)
+    image = serializers.CharField(max_length=100, allow_blank=True, required=False)
+    category_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=MAX_ID), required=False
+    )
+
+
+class ProductBulkSerializer(serializers.Serializer):
+    create = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    update = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    delete = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=MAX_ID), required=False, default=list
+    )
+
+    def validate(self, attrs):
+        limit = getattr(settings, 'SHOP_BULK_MAX_ITEMS', 1000)
+        if len(attrs['create']) + len(attrs['update']) + len(attrs['delete']) > limit:
+            raise serializers.ValidationError(f'Au plus {limit} opérations par requête.')
+        return attrs
@@ -0,0 +1,138 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+from django.contrib.sessions.models import Session
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Collects session writes and deletions and persists them to the
+    django_session table from a background thread, so requests never wait
+    on the SQLite write lock. Repeated writes of a session are coalesced.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def put(self, session_key, session_data, expire_date):
+        self._enqueue(session_key, (session_data, expire_date))
+
+    def delete(self, session_key):
+        self._enqueue(session_key, None)
+
+    def _enqueue(self, session_key, value):
+        with self._lock:
+            self._pending[session_key] = value
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='session-write-behind', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not persist sessions')
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """
+        Persist every pending write in one transaction-sized batch
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        deleted = [key for key, value in pending.items() if value is None]
+        sessions = [
+            Session(session_key=key, session_data=value[0], expire_date=value[1])
+            for key, value in pending.items() if value is not None
+        ]
+        if deleted:
+            Session.objects.filter(session_key__in=deleted).delete()
+        if sessions:
+            Session.objects.bulk_create(
+                sessions,
+                update_conflicts=True,
+                unique_fields=['session_key'],
+                update_fields=['session_data', 'expire_date'],
+            )
+        return len(pending)
+
+
+write_behind = WriteBehindQueue(interval=getattr(settings, 'SHOP_SESSION_WRITE_BEHIND_INTERVAL', 2))
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        write_behind.flush()
+        connection.close()
+    except Exception:
+        logger.exception('Could not persist sessions on exit')
+
+
+class SessionStore(CacheSessionStore):
+    """
+    Session engine served from the SESSION_CACHE_ALIAS cache (file based so
+    every worker on the box shares it), with the database written behind,
+    in batches, and read when a session is missing from the cache.
+    Deletions (logout, key rotation) reach the database right away.
+    """
+    cache_key_prefix = 'shop.sessions'
+
+    def load(self):
+        session_key = self.session_key
+        session_data = super().load()
+        if session_data or session_key is None:
+            return session_data
+
+        # Not in the cache (evicted or written by another node): fall back
+        # to the persisted copy and warm the cache again
+        try:
+            session = Session.objects.get(session_key=session_key, expire_date__gt=timezone.now())
+        except Session.DoesNotExist:
+            return {}
+        self._session_key = session_key
+        session_data = self.decode(session.session_data)
+        self._cache.set(self.cache_key, session_data, self.get_expiry_age(expiry=session.expire_date))
+        return session_data
+
+    def save(self, must_create=False):
+        super().save(must_create=must_create)
+        if self.session_key is not None:
+            write_behind.put(
+                self.session_key,
+                self.encode(self._get_session(no_load=must_create)),
+                self.get_expiry_date(),
+            )
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        super().delete(session_key)
+        if session_key is not None:
+            # Deleted right away: until the queue is flushed, a request with
+            # the old cookie would find the row and restore the session
+            Session.objects.filter(session_key=session_key).delete()
+            # Also queued, in case a flush in progress writes the session back
+            write_behind.delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        # Cached copies expire on their own, only the table needs cleaning
+        Session.objects.filter(expire_date__lt=timezone.now()).delete()
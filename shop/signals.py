@@ -0,0 +1,152 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user_tokens, token_cache
+from .cache import bump_catalog_version
+from .counters import adjust_product_counts
+from .images import IMAGE_FIELDS, schedule_derivatives
+from .models import CompanyConfig, Boutique, Slider, Product, Category, VendorUser, DeletedRecord
+
+
+CATALOG_MODELS = (CompanyConfig, Slider, Boutique, Product, Category)
+
+
+def _schedule_catalog_bump():
+    # Bump after commit so a concurrent rebuild never caches uncommitted rows
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_catalog_on_change(sender, **kwargs):
+    """
+    Bump the catalog version whenever a model embedded in the catalog changes
+    """
+    if sender in CATALOG_MODELS:
+        _schedule_catalog_bump()
+
+
+@receiver(post_save)
+def generate_image_derivatives(sender, instance, **kwargs):
+    """
+    Render resized copies of newly uploaded catalog images
+    """
+    field_name = IMAGE_FIELDS.get(sender._meta.label)
+    if field_name:
+        schedule_derivatives(getattr(instance, field_name))
+
+
+@receiver(post_delete)
+def record_tombstone(sender, instance, **kwargs):
+    """
+    Leave a tombstone so that delta sync clients learn about the deletion
+    """
+    if sender in CATALOG_MODELS:
+        DeletedRecord.objects.create(model_name=sender._meta.model_name, object_id=instance.pk)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def invalidate_catalog_on_categories_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # post_clear has no pk_set: remember the products losing the category
+        instance._cleared_product_ids = list(
+            sender.objects.filter(category_id=instance.pk).values_list('product_id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # Category changes do not touch the product row, so mark it as modified
+    # for delta sync
+    if not reverse:
+        Product.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+    else:
+        if action == 'post_clear':
+            pk_set = instance.__dict__.pop('_cleared_product_ids', None)
+        if pk_set:
+            Product.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+    _schedule_catalog_bump()
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_boutique(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and 'boutique' not in update_fields):
+        instance._previous_boutique_id = instance.boutique_id
+    else:
+        instance._previous_boutique_id = Product.objects.filter(pk=instance.pk).values_list('boutique_id', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def count_boutique_products_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_boutique_id', None)
+    if created:
+        adjust_product_counts(Boutique, {instance.boutique_id: 1})
+    elif previous is not None and previous != instance.boutique_id:
+        adjust_product_counts(Boutique, {previous: -1, instance.boutique_id: 1})
+
+
+@receiver(pre_delete, sender=Product)
+def count_category_products_on_delete(sender, instance, **kwargs):
+    # The category links are deleted by cascade, without m2m_changed
+    category_ids = Product.categories.through.objects.filter(product_id=instance.pk).values_list('category_id', flat=True)
+    adjust_product_counts(Category, {category_id: -1 for category_id in category_ids})
+
+
+@receiver(post_delete, sender=Product)
+def count_boutique_products_on_delete(sender, instance, **kwargs):
+    adjust_product_counts(Boutique, {instance.boutique_id: -1})
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def count_category_products(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep Category.product_count exact. Removals are counted before they
+    happen, from the links that actually exist.
+    """
+    if action == 'post_add' and pk_set:
+        if reverse:
+            adjust_product_counts(Category, {instance.pk: len(pk_set)})
+        else:
+            adjust_product_counts(Category, {category_id: 1 for category_id in pk_set})
+    elif action in ('pre_remove', 'pre_clear'):
+        links = sender.objects.filter(**{'category_id' if reverse else 'product_id': instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{'product_id__in' if reverse else 'category_id__in': pk_set})
+        if reverse:
+            adjust_product_counts(Category, {instance.pk: -links.count()})
+        else:
+            adjust_product_counts(Category, {category_id: -1 for category_id in links.values_list('category_id', flat=True)})
+
+
+@receiver(post_save, sender=VendorUser)
+def invalidate_catalog_on_owner_change(sender, update_fields=None, **kwargs):
+    """
+    Boutiques embed their owner, but a login only touches ``last_login``
+    """
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    _schedule_catalog_bump()
+
+
+@receiver(post_save, sender=VendorUser)
+@receiver(post_delete, sender=VendorUser)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    """
+    Password changes and deactivations must not be hidden by the token cache
+    """
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=Boutique)
+@receiver(post_delete, sender=Boutique)
+def invalidate_cached_boutique_ids(sender, **kwargs):
+    # The previous owner is unknown here, so drop every cached boutique id
+    token_cache.clear()
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CompanyConfig, Boutique, Slider, Product, Category, DeletedRecord
+from .serializers import (
+    CompanyConfigSerializer, BoutiqueSyncSerializer, SliderSerializer,
+    ProductSerializer, CategorySerializer, plan_queryset
+)
+
+
+# (response key, model, serializer) for every section returned by delta sync
+SYNC_SECTIONS = (
+    ('company_config', CompanyConfig, CompanyConfigSerializer),
+    ('sliders', Slider, SliderSerializer),
+    ('boutiques', Boutique, BoutiqueSyncSerializer),
+    ('categories', Category, CategorySerializer),
+    ('products', Product, ProductSerializer),
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment):
+    """
+    Encode a datetime as an opaque cursor (microseconds since the epoch)
+    """
+    delta = moment - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    return str(delta // timedelta(microseconds=1))
+
+
+def decode_cursor(cursor):
+    try:
+        microseconds = int(cursor)
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+    if microseconds < 0:
+        raise InvalidCursor(cursor)
+    try:
+        return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=microseconds)
+    except OverflowError:
+        # Past datetime.max
+        raise InvalidCursor(cursor)
+
+
+def build_changes(cursor=None):
+    """
+    Return the catalog rows created or modified after ``cursor`` together with
+    the ids deleted since then and the cursor to use for the next sync. Without
+    a cursor the whole catalog is returned.
+    """
+    since = decode_cursor(cursor) if cursor else None
+
+    # Rows saved just before this point may not be committed yet, so the next
+    # cursor overlaps slightly with this sync; clients apply rows as upserts
+    overlap = timedelta(seconds=getattr(settings, 'SHOP_SYNC_OVERLAP_SECONDS', 5))
+    next_cursor = encode_cursor(timezone.now() - overlap)
+
+    data = {'cursor': next_cursor, 'full': since is None}
+    deleted = {}
+    for key, model, serializer_class in SYNC_SECTIONS:
+        queryset = model._default_manager.all()
+        if since is not None:
+            queryset = queryset.filter(updated_at__gt=since)
+        data[key] = serializer_class(plan_queryset(queryset, serializer_class), many=True).data
+        deleted[key] = []
+
+    if since is not None:
+        section_keys = {model._meta.model_name: key for key, model, _ in SYNC_SECTIONS}
+        tombstones = DeletedRecord.objects.filter(deleted_at__gt=since).values_list('model_name', 'object_id')
+        for model_name, object_id in tombstones.iterator():
+            if model_name in section_keys:
+                deleted[section_keys[model_name]].append(object_id)
+
+    data['deleted'] = deleted
+    return data
@@ -1,3 +1,838 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import compression
+from .authentication import CachedTokenAuthentication, token_cache
+from .cache import get_catalog_version
+from .catalog_generator import CatalogGenerator
+from .images import derivative_name, has_derivatives, mark_derivatives, render_derivatives
+from .metrics import MetricsRegistry
+from .middleware import PIN_COOKIE, ReplicaRoutingMiddleware
+from .models import Boutique, Category, CompanyConfig, Product, Slider, VendorUser
+from .pagination import CatalogCursorPagination
+from .routers import ReadReplicaRouter, use_replica
+from .search import search_products
+from .serializers import ProductSerializer
+from .sessions import SessionStore, write_behind
+from .sync import decode_cursor
+from .views import PublicProductListView
+
+
+LOCAL_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-{alias}'}
+    for alias in ('default', 'catalog', 'sessions')
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class QueryBudgetTests(TestCase):
+    """
+    Number of queries of the main endpoints, which must not grow with the
+    catalog (20 boutiques of 25 products here). Caches start empty.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        generator = CatalogGenerator(20, 25, 5, seed=1, password='budget-password')
+        generator.run()
+        CompanyConfig.objects.create(name='Boutiques', whatsapp_number='+22500000000', address='Abidjan')
+        Slider.objects.bulk_create([
+            Slider(image=f'slider_images/{n}.jpg', title=f'Slider {n}', description='Promotion', order=n)
+            for n in range(3)
+        ])
+        cls.vendor = VendorUser.objects.get(username=generator.usernames()[0])
+        cls.token = Token.objects.create(user=cls.vendor)
+
+    def setUp(self):
+        for alias in LOCAL_CACHES:
+            caches[alias].clear()
+        token_cache.clear()
+
+    def vendor_get(self, path):
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_public_product_list(self):
+        # Page, categories, then the facet totals, boutiques and categories
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/public/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_vendor_product_list(self):
+        # Token, page and categories
+        with self.assertNumQueries(3):
+            response = self.vendor_get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_vendor_dashboard(self):
+        # Token, boutique with its owner, products, their categories and
+        # the boutique categories
+        with self.assertNumQueries(5):
+            response = self.vendor_get('/api/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['products']), 25)
+
+    def test_init_app_data(self):
+        with self.assertNumQueries(8):
+            response = self.client.get('/api/init-app-data/')
+        self.assertEqual(response.status_code, 200)
+
+        # Then served from the snapshot
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/init-app-data/')
+        self.assertEqual(cached.content, response.content)
+        with self.assertNumQueries(0):
+            revalidated = self.client.get('/api/init-app-data/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class TokenCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = VendorUser.objects.create_user(username='vendeur', password='ancien-secret', email='a@example.com')
+        cls.token = Token.objects.create(user=cls.vendor)
+
+    def setUp(self):
+        token_cache.clear()
+
+    def authenticate(self):
+        return CachedTokenAuthentication().authenticate_credentials(self.token.key)[0]
+
+    def test_cached_tokens_need_no_query(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.pk, self.vendor.pk)
+
+    def test_entries_expire(self):
+        self.authenticate()
+        expired = time.monotonic() + token_cache.ttl + 1
+        with mock.patch('shop.authentication.time.monotonic', return_value=expired), self.assertNumQueries(1):
+            self.authenticate()
+
+    def test_password_and_activation_changes_invalidate(self):
+        self.authenticate()
+        vendor = VendorUser.objects.get(pk=self.vendor.pk)
+        vendor.set_password('nouveau-secret')
+        vendor.save()
+        self.assertTrue(self.authenticate().check_password('nouveau-secret'))
+
+        vendor.is_active = False
+        vendor.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def change_password(self, old_password):
+        return self.client.post(
+            '/api/change-password/', {'old_password': old_password, 'new_password': 'nouveau-secret'},
+            content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+
+    def test_password_change_ignores_the_cached_user(self):
+        self.authenticate()
+        # Edits made by another worker, whose signals never reach this cache
+        VendorUser.objects.filter(pk=self.vendor.pk).update(email='admin@example.com')
+        self.assertEqual(self.change_password('ancien-secret').status_code, 200)
+        vendor = VendorUser.objects.get(pk=self.vendor.pk)
+        self.assertEqual(vendor.email, 'admin@example.com')
+        self.assertTrue(vendor.check_password('nouveau-secret'))
+
+        self.authenticate()
+        vendor.set_password('autre-secret')
+        VendorUser.objects.filter(pk=vendor.pk).update(password=vendor.password)
+        self.assertEqual(self.change_password('nouveau-secret').status_code, 400)
+
+        VendorUser.objects.filter(pk=vendor.pk).update(is_active=False)
+        self.assertEqual(self.change_password('autre-secret').status_code, 403)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = VendorUser.objects.create_user(username='vendeur', password='secret')
+        boutique = Boutique.objects.create(name='Boutique', description='', image='b.jpg', owner=vendor)
+        cls.product = Product.objects.create(
+            title='Robe', description='', price=10, image='p.jpg', stock=5, boutique=boutique
+        )
+
+    def setUp(self):
+        caches['catalog'].clear()
+
+    def reserve(self, items):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/public/reserve/', {'items': items}, content_type='application/json')
+
+    def test_reservation_refreshes_snapshot(self):
+        before = self.client.get('/api/init-app-data/')
+        self.assertEqual(self.reserve([{'product': self.product.pk, 'quantity': 5}]).status_code, 201)
+
+        after = self.client.get('/api/init-app-data/')
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertEqual(json.loads(after.content)['products'][0]['stock'], 0)
+
+    def test_duplicate_lines_are_merged(self):
+        response = self.reserve([
+            {'product': self.product.pk, 'quantity': 2}, {'product': self.product.pk, 'quantity': 3},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['items'], [{'product': self.product.pk, 'quantity': 5}])
+
+    def test_out_of_range_carts_are_rejected(self):
+        for items in (
+            [{'product': 2 ** 70, 'quantity': 1}],
+            [{'product': self.product.pk, 'quantity': 2 ** 70}],
+            [{'product': self.product.pk, 'quantity': 6000}] * 2,
+            [{'product': self.product.pk, 'quantity': 1}] * 101,
+        ):
+            self.assertEqual(self.reserve(items).status_code, 400)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+
+class QuoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CompanyConfig.objects.create(name='Boutiques', whatsapp_number='+225 07 00 00 00', address='Abidjan')
+        products = []
+        for n, name in enumerate(('Chez Awa', 'Maison Fatou')):
+            vendor = VendorUser.objects.create_user(username=f'vendeur{n}', password='secret')
+            boutique = Boutique.objects.create(name=name, description='', image='b.jpg', owner=vendor)
+            products.append(Product.objects.create(
+                title=f'Robe {n}', description='', price='12.50', image='p.jpg', stock=3, boutique=boutique
+            ))
+        cls.awa, cls.fatou = products
+
+    def quote(self, items):
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/public/quote/', {'items': items}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_totals(self):
+        quote = self.quote([
+            {'product': self.awa.pk, 'quantity': 2}, {'product': self.fatou.pk, 'quantity': 1},
+            {'product': self.awa.pk, 'quantity': 1},
+        ])
+        self.assertEqual(quote['total'], '50.00')
+        self.assertEqual([(line['quantity'], line['line_total']) for line in quote['lines']], [(3, '37.50'), (1, '12.50')])
+        self.assertEqual([boutique['subtotal'] for boutique in quote['boutiques']], ['37.50', '12.50'])
+        self.assertTrue(quote['available'])
+        self.assertIn('Total : 50.00', quote['whatsapp_message'])
+        self.assertTrue(quote['whatsapp_url'].startswith('https://wa.me/22507000000?text='))
+
+    def test_stock_and_missing_products(self):
+        quote = self.quote([{'product': self.awa.pk, 'quantity': 4}, {'product': 999999, 'quantity': 1}])
+        self.assertEqual(quote['missing'], [999999])
+        self.assertEqual(quote['total'], '50.00')
+        self.assertFalse(quote['lines'][0]['available'])
+        self.assertFalse(quote['available'])
+
+        quote = self.quote([{'product': 999999, 'quantity': 1}])
+        self.assertEqual((quote['lines'], quote['total'], quote['available']), ([], '0.00', False))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SessionTests(TestCase):
+    def persisted_session(self, **data):
+        session = SessionStore()
+        session.update(data)
+        session.save()
+        write_behind.flush()
+        return session
+
+    def test_deleted_session_is_not_restored(self):
+        session = self.persisted_session(user='vendeur')
+        key = session.session_key
+        session.delete()
+        self.assertFalse(Session.objects.filter(session_key=key).exists())
+        self.assertEqual(SessionStore(key).load(), {})
+
+    def test_cycled_key_is_not_restored(self):
+        session = self.persisted_session(user='vendeur')
+        old_key = session.session_key
+        session.cycle_key()
+        write_behind.flush()
+        self.assertEqual(SessionStore(old_key).load(), {})
+        self.assertEqual(SessionStore(session.session_key).load(), {'user': 'vendeur'})
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BulkWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = VendorUser.objects.create_user(username='vendeur', password='secret')
+        boutique = Boutique.objects.create(name='Boutique', description='', image='b.jpg', owner=vendor)
+        cls.category = Category.objects.create(name='Robes', boutique=boutique)
+        cls.product = Product.objects.create(
+            title='Robe', description='', price=10, image='p.jpg', stock=5, boutique=boutique
+        )
+        cls.token = Token.objects.create(user=vendor)
+
+    def setUp(self):
+        token_cache.clear()
+
+    def bulk(self, body):
+        return self.client.post(
+            '/api/products/bulk/', body, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+
+    def test_invalid_requests_are_rejected(self):
+        pk = self.product.pk
+        for body in (
+            {'update': [{'id': pk, 'category_ids': [self.category.pk]}, {'id': pk, 'category_ids': [self.category.pk]}]},
+            {'update': [{'id': pk, 'stock': 1}], 'delete': [pk]},
+            {'delete': [pk, pk]},
+            {'update': [{'id': 2 ** 70, 'stock': 1}]},
+            {'update': [{'id': pk, 'stock': 2 ** 40}]},
+            {'delete': [2 ** 70]},
+        ):
+            self.assertEqual(self.bulk(body).status_code, 400, body)
+        self.assertTrue(Product.objects.filter(pk=pk, stock=5).exists())
+
+    def test_repeated_category_ids_link_once(self):
+        response = self.bulk({
+            'update': [{'id': self.product.pk, 'category_ids': [self.category.pk, self.category.pk]}],
+            'create': [{'title': 'Pagne', 'description': '', 'price': '5', 'stock': 1,
+                        'category_ids': [self.category.pk, self.category.pk]}],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.product_count, 2)
+        self.assertEqual(self.category.products.count(), 2)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ImageSrcsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = VendorUser.objects.create_user(username='vendeur', password='secret')
+        boutique = Boutique.objects.create(name='Boutique', description='', image='b.jpg', owner=vendor)
+        cls.product = Product.objects.create(
+            title='Robe', description='', price=10, image='product_images/robe.png', stock=5, boutique=boutique
+        )
+
+    def srcset(self):
+        # Serializing must not ask the storage whether the renditions exist
+        with mock.patch('shop.images.has_derivatives', side_effect=AssertionError):
+            response = self.client.get('/api/public/products/', {'fields': 'id,image_srcset'})
+        return response.data['results'][0]['image_srcset']
+
+    def test_srcset_follows_the_recorded_width(self):
+        self.assertIsNone(self.srcset())
+
+        mark_derivatives(Product, 'image', {'product_images/robe.png': 1280})
+        srcset = self.srcset()
+        self.assertEqual(set(srcset), {'webp', 'jpeg'})
+        self.assertEqual(list(srcset['webp']), ['320w', '640w', '1280w'])
+        self.assertTrue(srcset['webp']['320w'].endswith('product_images/robe.png.320w.webp'))
+
+        mark_derivatives(Product, 'image', {'product_images/robe.png': 500})
+        self.assertEqual(list(self.srcset()['jpeg']), ['320w', '500w'])
+
+    def test_sources_sharing_a_stem_get_their_own_renditions(self):
+        self.assertNotEqual(derivative_name('p/robe.png', 320, 'webp'), derivative_name('p/robe.jpg', 320, 'webp'))
+
+    def test_sources_are_never_upscaled(self):
+        from PIL import Image
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for source_width, widths in ((300, [300]), (1000, [320, 640, 1000]), (2000, [320, 640, 1280])):
+            source = os.path.join(directory.name, f'robe-{source_width}.png')
+            Image.new('RGBA', (source_width, 100)).save(source)
+            written = render_derivatives(source)
+            self.assertEqual(len(written), 2 * len(widths))
+            for width in widths:
+                with Image.open(derivative_name(source, width, 'webp')) as rendition:
+                    self.assertEqual(rendition.width, width)
+            with override_settings(MEDIA_ROOT=directory.name):
+                self.assertEqual(has_derivatives(os.path.basename(source)), widths[-1])
+
+
+@override_settings(CACHES=LOCAL_CACHES, SHOP_EXPORT_CHUNK_SIZE=20)
+class ProductExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CatalogGenerator(3, 25, 2, seed=1, password='export-password').run()
+
+    def export(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/public/products/export/', params)
+            body = b''.join(response.streaming_content)
+        return response, body, len(queries)
+
+    def test_json_export(self):
+        response, body, queries = self.export()
+        self.assertTrue(response.streaming)
+        products = json.loads(body)
+        self.assertEqual([product['id'] for product in products], list(Product.objects.order_by('id').values_list('id', flat=True)))
+        expected = ProductSerializer(Product.objects.order_by('id').first()).data
+        self.assertEqual(products[0], json.loads(JSONRenderer().render(expected)))
+        # The products through one cursor, then the categories of each chunk
+        # of 20: grows with the catalog size over the chunk size only
+        self.assertEqual(queries, 1 + 4)
+
+    def test_ndjson_export(self):
+        response, body, _ = self.export(format='ndjson', fields='id,title')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = body.decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 75)
+        self.assertEqual(set(json.loads(lines[0])), {'id', 'title'})
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CatalogGenerator(3, 25, 2, seed=1, password='compression-password').run()
+        CompanyConfig.objects.create(name='Boutiques', whatsapp_number='+22500000000', address='Abidjan')
+
+    def setUp(self):
+        for alias in LOCAL_CACHES:
+            caches[alias].clear()
+
+    def get(self, **headers):
+        return self.client.get('/api/init-app-data/', HTTP_ACCEPT_ENCODING='gzip', **headers)
+
+    def test_cached_body_compressed_once(self):
+        plain = self.client.get('/api/init-app-data/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertGreaterEqual(len(plain.content), 8192)
+
+        with mock.patch('shop.compression.compress', wraps=compression.compress) as compress:
+            first = self.get()
+            second = self.get()
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(gzip.decompress(second.content), plain.content)
+        self.assertEqual(second['Content-Length'], str(len(second.content)))
+        self.assertIn('Accept-Encoding', second['Vary'])
+
+        # A new catalog version compresses the new body
+        product = Product.objects.first()
+        product.title = 'Renommé'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        with mock.patch('shop.compression.compress', wraps=compression.compress) as compress:
+            changed = self.get()
+        self.assertEqual(compress.call_count, 1)
+        self.assertIn('Renommé', gzip.decompress(changed.content).decode('utf-8'))
+
+    def test_revalidation_of_compressed_body(self):
+        plain = self.client.get('/api/init-app-data/')
+        compressed = self.get()
+        self.assertEqual(compressed['ETag'], 'W/' + plain['ETag'])
+
+        # Either form of the ETag revalidates, and the 304 carries the same
+        # ETag and Vary as the compressed 200 without any body or encoding
+        for etag in (compressed['ETag'], plain['ETag']):
+            revalidated = self.get(HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(revalidated.status_code, 304)
+            self.assertEqual(revalidated.content, b'')
+            self.assertFalse(revalidated.has_header('Content-Encoding'))
+            self.assertEqual(revalidated['ETag'], compressed['ETag'])
+            self.assertIn('Accept-Encoding', revalidated['Vary'])
+
+        # Without Accept-Encoding the strong ETag is kept
+        revalidated = self.client.get('/api/init-app-data/', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], plain['ETag'])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CatalogGenerator(2, 10, 3, seed=1, password='admin-password').run()
+        cls.admin = VendorUser.objects.create_superuser('admin', 'admin-password')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/shop/product/', params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_queries_do_not_grow_with_the_catalog(self):
+        before = len(self.changelist())
+        CatalogGenerator(4, 30, 3, seed=2, password='admin-password').run()
+        self.assertEqual(len(self.changelist()), before)
+
+    def test_large_table_count_is_estimated(self):
+        counts = [sql for sql in self.changelist() if 'COUNT(' in sql]
+        self.assertEqual(len(counts), 1)
+        with override_settings(SHOP_ADMIN_ESTIMATED_COUNT_THRESHOLD=5):
+            queries = self.changelist()
+            self.assertFalse([sql for sql in queries if 'COUNT(' in sql])
+            # Filtered lists keep an exact count
+            filtered = self.changelist(boutique__id__exact=Boutique.objects.first().pk)
+            self.assertEqual(len([sql for sql in filtered if 'COUNT(' in sql]), 1)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = VendorUser.objects.create_user(username='vendeur', password='secret')
+        cls.boutique = Boutique.objects.create(name='Chez Awa', description='', image='b.jpg', owner=vendor)
+        cls.product = Product.objects.create(
+            title='Robe en pagne', description='Coton imprimé', price=10, image='p.jpg', stock=5, boutique=cls.boutique
+        )
+
+    def search(self, text):
+        return list(search_products(Product.objects.all(), text).values_list('id', flat=True))
+
+    def test_index_follows_product_writes(self):
+        self.assertEqual(self.search('pagn'), [self.product.pk])
+        self.assertEqual(self.search('imprime'), [self.product.pk])
+
+        self.product.title = 'Chemise wax'
+        self.product.save()
+        self.assertEqual(self.search('pagne'), [])
+        self.assertEqual(self.search('chemise'), [self.product.pk])
+
+        self.product.delete()
+        self.assertEqual(self.search('chemise'), [])
+
+    def test_index_follows_boutique_renames(self):
+        self.assertEqual(self.search('awa'), [self.product.pk])
+        self.boutique.name = 'Maison Fatou'
+        self.boutique.save()
+        self.assertEqual(self.search('awa'), [])
+        self.assertEqual(self.search('fatou robe'), [self.product.pk])
+
+    def test_query_syntax_is_escaped(self):
+        for text in ('robe"', 'robe OR chemise', 'title:robe', 'robe*', '-robe', '^robe', 'NEAR(robe pagne)', '"'):
+            response = self.client.get('/api/public/products/search/', {'q': text})
+            self.assertEqual(response.status_code, 200, text)
+        self.assertEqual(self.search('robe OR chemise'), [])
+        self.assertEqual(self.search('title:robe'), [])
+        self.assertEqual(self.search('"'), [])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ProductFilterTests(TestCase):
+    def test_out_of_range_filters_are_rejected(self):
+        for params in (
+            {'boutique': '99999999999999999999999'},
+            {'category': '-1'},
+            {'price_min': 'NaN'},
+            {'price_max': 'Infinity'},
+            {'price_min': '1e30'},
+        ):
+            response = self.client.get('/api/public/products/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(next(iter(params)), response.data)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = VendorUser.objects.create_user(username='vendeur', password='secret')
+        boutique = Boutique.objects.create(name='Boutique', description='', image='b.jpg', owner=vendor)
+        # More tied rows than DRF's offset_cutoff (1000)
+        Product.objects.bulk_create([
+            Product(title=f'Robe {n}', description='', price=11 if n % 100 == 0 else 10, image='p.jpg', stock=1, boutique=boutique)
+            for n in range(1100)
+        ])
+
+    def pages(self, url, link='next'):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([product['id'] for product in response.data['results']])
+            url = response.data[link]
+        return pages, response
+
+    def test_tied_prices_are_paged_without_repeats(self):
+        for ordering, reverse in (('price', False), ('-price', True)):
+            pages, _ = self.pages(f'/api/public/products/?ordering={ordering}&fields=id')
+            ids = [pk for page in pages for pk in page]
+            expected = sorted(Product.objects.values_list('price', 'id'), reverse=reverse)
+            self.assertEqual(ids, [pk for _, pk in expected])
+
+    def test_previous_links_walk_back(self):
+        forward, last = self.pages('/api/public/products/?ordering=price&fields=id')
+        backward, _ = self.pages(last.data['previous'], link='previous')
+        self.assertEqual(backward, forward[-2::-1])
+
+    def test_invalid_cursors_are_not_found(self):
+        # Garbage, no id, a non-numeric price, an out-of-range price and id 0
+        for cursor in ('abc', 'cD0xMA==', 'cD14Jmk9MQ==', 'cD0xZTk5Jmk9MQ==', 'cD0xMCZpPTA='):
+            response = self.client.get('/api/public/products/', {'ordering': 'price', 'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_ordering_ends_with_id(self):
+        view = PublicProductListView()
+        for query, expected in (
+            ('', ('-created_at', '-id')),
+            ('?ordering=price', ('price', 'id')),
+            ('?ordering=-price', ('-price', '-id')),
+        ):
+            request = Request(RequestFactory().get(f'/api/public/products/{query}'))
+            ordering = CatalogCursorPagination().get_ordering(request, Product.objects.all(), view)
+            self.assertEqual(ordering, expected)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CatalogGenerator(3, 25, 2, seed=1, password='async-password').run()
+        Slider.objects.bulk_create([
+            Slider(image=f'slider_images/{n}.jpg', title=f'Slider {n}', description='', order=n) for n in range(3)
+        ])
+
+    async def test_responses_match_the_sync_views(self):
+        client = AsyncClient()
+        for path in (
+            '/api/public/products/',
+            '/api/public/products/?ordering=price&cursor=abc',
+            '/api/public/products/?price_min=NaN',
+            '/api/public/boutiques/',
+            '/api/public/boutiques/?page=abc',
+            '/api/public/boutiques/?page=99',
+            '/api/public/sliders/?page=0',
+            '/api/public/config/',
+        ):
+            expected = await sync_to_async(self.client.get)(path)
+            response = await client.get(path)
+            self.assertEqual(response.status_code, expected.status_code, path)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content), path)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(SHOP_READ_REPLICAS=['replica'], SHOP_PRIMARY_PIN_SECONDS=30)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse())
+        self.router = ReadReplicaRouter()
+
+    def request(self, method='get', path='/api/public/products/', **cookies):
+        request = getattr(RequestFactory(), method)(path)
+        request.COOKIES.update(cookies)
+        request.resolver_match = resolve(path)
+        return request
+
+    def serve(self, request, response, view=lambda request: None):
+        self.middleware.process_request(request)
+        self.middleware.process_view(request, view, (), {})
+        routed = self.router.db_for_read(Product)
+        return routed, self.middleware.process_response(request, response)
+
+    def test_public_reads_use_the_replica_until_the_response_is_done(self):
+        routed, _ = self.serve(self.request(), HttpResponse())
+        self.assertEqual(routed, 'replica')
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_streamed_bodies_are_read_from_the_replica(self):
+        def body():
+            yield self.router.db_for_read(Product)
+
+        _, response = self.serve(self.request(), StreamingHttpResponse(body()))
+        self.assertEqual(list(response.streaming_content), [b'replica'])
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_other_requests_use_the_primary(self):
+        self.assertIsNone(self.serve(self.request(path='/api/products/'), HttpResponse())[0])
+        self.assertIsNone(self.serve(self.request(method='post'), HttpResponse())[0])
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Product), 'replica')
+            self.assertEqual(self.router.db_for_write(Product), 'default')
+
+    def test_writers_are_pinned_to_the_primary(self):
+        _, response = self.serve(self.request(method='post', path='/api/products/'), HttpResponse())
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 30)
+
+        routed, _ = self.serve(self.request(**{PIN_COOKIE: cookie.value}), HttpResponse())
+        self.assertIsNone(routed)
+        expired = str(int(time.time()) - 1)
+        self.assertEqual(self.serve(self.request(**{PIN_COOKIE: expired}), HttpResponse())[0], 'replica')
+
+
+class SyncTests(TestCase):
+    def test_clearing_a_category_marks_its_products(self):
+        vendor = VendorUser.objects.create_user(username='vendeur', password='secret')
+        boutique = Boutique.objects.create(name='Boutique', description='', image='b.jpg', owner=vendor)
+        category = Category.objects.create(name='Robes', boutique=boutique)
+        product = Product.objects.create(title='Robe', description='', price=10, image='p.jpg', stock=1, boutique=boutique)
+        product.categories.add(category)
+        cursor = self.client.get('/api/sync/').data['cursor']
+        Product.objects.filter(pk=product.pk).update(updated_at=timezone.now() - timedelta(days=1))
+
+        category.products.clear()
+        product.refresh_from_db()
+        self.assertGreater(product.updated_at, decode_cursor(cursor))
+
+    def test_invalid_cursors_are_rejected(self):
+        for since in ('abc', '-1', '99999999999999999999', str(2 ** 70)):
+            response = self.client.get('/api/sync/', {'since': since})
+            self.assertEqual(response.status_code, 400, since)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ImportProductsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CatalogGenerator(1, 2, 1, seed=1, password='import-password').run()
+        cls.boutique = Boutique.objects.get()
+        cls.category = Category.objects.get()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'products.jsonl')
+        rows = [
+            {'title': f'Import {n}', 'price': '1500', 'stock': 3, 'categories': [self.category.name, 'Nouveautés']}
+            for n in range(5)
+        ]
+        rows[2]['price'] = 'gratuit'
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            stream.write(''.join(json.dumps(row) + '\n' for row in rows))
+
+    def import_products(self, **options):
+        stderr = StringIO()
+        call_command('import_products', self.path, boutique=self.boutique.pk, batch_size=2, stdout=StringIO(), stderr=stderr, **options)
+        return stderr.getvalue()
+
+    def test_rows_are_inserted_in_batches(self):
+        version = get_catalog_version()
+        with CaptureQueriesContext(connection) as queries:
+            errors = self.import_products()
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "shop_product"')]
+        # Batches of 2 rows: the invalid third row leaves one in the second
+        self.assertEqual(len(inserts), 3)
+        self.assertIn('Line 3:', errors)
+
+        imported = Product.objects.filter(title__startswith='Import ')
+        self.assertEqual(imported.count(), 4)
+        self.boutique.refresh_from_db()
+        self.assertEqual(self.boutique.product_count, 6)
+        self.assertEqual(Category.objects.get(name='Nouveautés').product_count, 4)
+        self.assertEqual(Category.objects.get(pk=self.category.pk).product_count, self.category.product_count + 4)
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_failing_batch_is_rolled_back(self):
+        Through = Product.categories.through
+        bulk_create = Through.objects.bulk_create
+        calls = []
+
+        def failing_bulk_create(objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) == 2:
+                raise IntegrityError('lien invalide')
+            return bulk_create(objs, *args, **kwargs)
+
+        version = get_catalog_version()
+        with mock.patch.object(Through.objects, 'bulk_create', side_effect=failing_bulk_create):
+            with self.assertRaises(IntegrityError):
+                self.import_products()
+
+        # Only the first batch is kept, counters included
+        self.assertEqual(list(Product.objects.filter(title__startswith='Import ').values_list('title', flat=True)), ['Import 0', 'Import 1'])
+        self.boutique.refresh_from_db()
+        self.assertEqual(self.boutique.product_count, 4)
+        self.assertEqual(Category.objects.get(name='Nouveautés').product_count, 2)
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_dry_run_writes_nothing(self):
+        with self.assertNumQueries(1):
+            errors = self.import_products(dry_run=True)
+        self.assertIn('Line 3:', errors)
+        self.assertFalse(Product.objects.filter(title__startswith='Import ').exists())
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_idle_process_writes_nothing(self):
+        MetricsRegistry(self.directory).flush()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_forked_process_gets_its_own_file(self):
+        registry = MetricsRegistry(self.directory)
+        registry.observe('products', 'GET', 200, 0.01)
+        registry.flush()
+        parent_file = registry.file_name
+
+        registry._reset()
+        self.assertEqual(registry.snapshot(), {})
+        registry.observe('products', 'GET', 200, 0.01)
+        registry.flush()
+        self.assertNotEqual(registry.file_name, parent_file)
+        self.assertEqual(registry.collect()['products|GET']['count'], 2)
+
+    def test_stale_files_are_pruned(self):
+        writer = MetricsRegistry(self.directory, flush_interval=10, retention_intervals=6)
+        writer.observe('products', 'GET', 200, 0.01)
+        writer.flush()
+        path = os.path.join(self.directory, writer.file_name)
+        reader = MetricsRegistry(self.directory, flush_interval=10, retention_intervals=6)
+        self.assertEqual(reader.collect()['products|GET']['count'], 1)
+
+        os.utime(path, (time.time() - 61, time.time() - 61))
+        self.assertEqual(reader.collect(), {})
+        self.assertFalse(os.path.exists(path))
+
+
+class CreateVendorAccountTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.source = os.path.join(self.directory, 'vendors.json')
+        with open(self.source, 'w', encoding='utf-8') as stream:
+            json.dump([
+                {'username': ' awa ', 'email': 'Awa@EXAMPLE.COM ', 'boutique_name': 'Chez Awa'},
+                {'username': 'awa', 'boutique_name': 'Doublon'},
+            ], stream)
+
+    def create_batch(self, output):
+        call_command('create_vendor_account', from_file=self.source, output=output, workers=1, stderr=StringIO(), stdout=StringIO())
+
+    def test_batch_entries_are_normalized(self):
+        output = os.path.join(self.directory, 'credentials.csv')
+        self.create_batch(output)
+        vendor = VendorUser.objects.get()
+        self.assertEqual((vendor.username, vendor.email), ('awa', 'Awa@example.com'))
+        with open(output, encoding='utf-8') as stream:
+            self.assertEqual(len(stream.read().splitlines()), 2)
+
+    def test_unwritable_output_creates_nothing(self):
+        with self.assertRaises(OSError):
+            self.create_batch(os.path.join(self.directory, 'missing', 'credentials.csv'))
+        self.assertFalse(VendorUser.objects.exists())
@@ -10,14 +10,25 @@ urlpatterns = [
     # Vendor dashboard URLs
     path('dashboard/', views.VendorDashboardView.as_view(), name='vendor-dashboard'),
     path('products/', views.VendorProductListView.as_view(), name='vendor-products'),
+    path('products/bulk/', views.VendorProductBulkView.as_view(), name='vendor-products-bulk'),
     path('products/<int:pk>/', views.VendorProductDetailView.as_view(), name='vendor-product-detail'),
     path('categories/', views.VendorCategoryListView.as_view(), name='vendor-categories'),
     path('categories/<int:pk>/', views.VendorCategoryDetailView.as_view(), name='vendor-category-detail'),
     
     # Public URLs
     path('init-app-data/', views.init_app_data_view, name='init-app-data'),
+    path('sync/', views.sync_view, name='sync'),
     path('public/products/', views.PublicProductListView.as_view(), name='public-products'),
+    path('public/products/search/', views.PublicProductSearchView.as_view(), name='public-products-search'),
+    path('public/products/export/', views.public_product_export_view, name='public-products-export'),
     path('public/boutiques/', views.PublicBoutiqueListView.as_view(), name='public-boutiques'),
     path('public/sliders/', views.PublicSliderListView.as_view(), name='public-sliders'),
+    path('public/quote/', views.quote_view, name='public-quote'),
+    path('public/reserve/', views.reserve_view, name='public-reserve'),
+    path('public/reserve/<uuid:token>/', views.reservation_cancel_view, name='public-reserve-cancel'),
+    path('public/reserve/<uuid:token>/confirm/', views.reservation_confirm_view, name='public-reserve-confirm'),
     path('public/config/', views.PublicCompanyConfigView.as_view(), name='public-config'),
+
+    # Monitoring
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
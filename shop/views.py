@@ -1,15 +1,30 @@
 from django.shortcuts import render
 from django.contrib.auth import login, logout
 from django.contrib.auth.hashers import make_password
-from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from rest_framework import exceptions, generics, status, permissions, serializers
+from rest_framework.filters import OrderingFilter
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, renderer_classes
 from rest_framework.permissions import AllowAny, BasePermission
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import CompanyConfig, Boutique, Slider, Product, Category, VendorUser
+from .authentication import get_boutique_id, invalidate_token, invalidate_user_tokens
+from .pagination import CatalogCursorPagination
+from .renderers import StreamingJSONRenderer, NDJSONRenderer, iter_serialized_chunks
+from .bulk import ProductBulkWriter
+from .cache import get_init_app_data_snapshot, etag_matches
+from .filters import ProductFilterBackend, parse_product_filters, get_product_facets
+from .metrics import registry, render as render_metrics
+from .quotes import build_quote
+from .reservations import InsufficientStock, reserve_stock, release_reservation, confirm_reservation
+from .search import search_products
+from .sync import build_changes, InvalidCursor
+from .models import CompanyConfig, Boutique, Slider, Product, Category, VendorUser, StockReservation
 from .serializers import (
     CompanyConfigSerializer, BoutiqueSerializer, SliderSerializer, 
-    ProductSerializer, CategorySerializer, VendorUserSerializer, LoginSerializer
+    ProductSerializer, CategorySerializer, VendorUserSerializer, LoginSerializer,
+    CartSerializer, StockReservationSerializer, ProductBulkSerializer, FieldSelection, plan_queryset
 )
 
 
@@ -18,15 +33,40 @@ class IsVendorOwner(BasePermission):
     Custom permission to only allow owners of an object to edit it.
     """
     def has_object_permission(self, request, view, obj):
-        # Check if the object has a boutique attribute
-        if hasattr(obj, 'boutique'):
-            return obj.boutique.owner == request.user
+        boutique_id = get_boutique_id(request.user)
+        if boutique_id is None:
+            return False
         # For Boutique objects specifically
-        elif isinstance(obj, Boutique):
-            return obj.owner == request.user
+        if isinstance(obj, Boutique):
+            return obj.pk == boutique_id
+        # Objects belonging to a boutique
+        if hasattr(obj, 'boutique_id'):
+            return obj.boutique_id == boutique_id
         return False
 
 
+class QueryPlanMixin:
+    """
+    Build the view queryset from the relations declared by its serializer,
+    restricted to the fields and relations the client asked for with
+    ``?fields=`` and ``?expand=``. Views provide their unoptimized queryset
+    through ``get_base_queryset``.
+    """
+    def get_base_queryset(self):
+        return super().get_queryset()
+
+    def get_ordering_columns(self):
+        # Cursor pagination reads the ordering values from the last row
+        ordering = tuple(getattr(self.pagination_class, 'ordering', ())) + tuple(getattr(self, 'ordering_fields', ()))
+        return tuple(name.lstrip('-') for name in ordering)
+
+    def get_queryset(self):
+        return plan_queryset(
+            self.get_base_queryset(), self.get_serializer_class(),
+            FieldSelection.from_request(self.request), keep=self.get_ordering_columns(),
+        )
+
+
 class LoginView(APIView):
     """
     View to handle vendor login
@@ -52,6 +92,8 @@ class LogoutView(APIView):
     View to handle vendor logout
     """
     def post(self, request):
+        if request.auth is not None:
+            invalidate_token(request.auth.key)
         logout(request)
         return Response({'message': 'Déconnexion réussie'}, status=status.HTTP_200_OK)
 
@@ -63,75 +105,111 @@ class VendorDashboardView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        if hasattr(request.user, 'boutique'):
-            boutique = request.user.boutique
-            boutique_serializer = BoutiqueSerializer(boutique)
+        boutique_id = get_boutique_id(request.user)
+        selection = FieldSelection.from_request(request)
+        boutique = plan_queryset(Boutique.objects.filter(pk=boutique_id), BoutiqueSerializer, selection).first() if boutique_id else None
+        if boutique is not None:
+            boutique_serializer = BoutiqueSerializer(boutique, selection=selection)
             return Response(boutique_serializer.data)
         else:
             return Response({'error': 'Aucune boutique associée à cet utilisateur'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class VendorProductListView(generics.ListCreateAPIView):
+class VendorProductListView(QueryPlanMixin, generics.ListCreateAPIView):
     """
     View to list and create products for the authenticated vendor
     """
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
-
-    def get_queryset(self):
-        if hasattr(self.request.user, 'boutique'):
-            return Product.objects.filter(boutique=self.request.user.boutique)
+    pagination_class = CatalogCursorPagination
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['created_at', 'price']
+
+    def get_base_queryset(self):
+        boutique_id = get_boutique_id(self.request.user)
+        if boutique_id is not None:
+            return Product.objects.filter(boutique_id=boutique_id)
         return Product.objects.none()
 
     def perform_create(self, serializer):
-        if hasattr(self.request.user, 'boutique'):
-            serializer.save(boutique=self.request.user.boutique)
+        boutique_id = get_boutique_id(self.request.user)
+        if boutique_id is not None:
+            # Overrides any boutique sent by the client
+            serializer.save(boutique=Boutique(pk=boutique_id))
         else:
             raise serializers.ValidationError('Aucune boutique associée à cet utilisateur')
 
 
-class VendorProductDetailView(generics.RetrieveUpdateDestroyAPIView):
+class VendorProductDetailView(QueryPlanMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     View to retrieve, update or delete a specific product for the authenticated vendor
     """
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated, IsVendorOwner]
 
-    def get_queryset(self):
-        if hasattr(self.request.user, 'boutique'):
-            return Product.objects.filter(boutique=self.request.user.boutique)
+    def get_base_queryset(self):
+        boutique_id = get_boutique_id(self.request.user)
+        if boutique_id is not None:
+            return Product.objects.filter(boutique_id=boutique_id)
         return Product.objects.none()
 
 
-class VendorCategoryListView(generics.ListCreateAPIView):
+class VendorProductBulkView(APIView):
+    """
+    View to create, partially update and delete many products of the
+    authenticated vendor in one transaction
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        boutique_id = get_boutique_id(request.user)
+        if boutique_id is None:
+            return Response({'error': 'Aucune boutique associée à cet utilisateur'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = ProductBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        writer = ProductBulkWriter(boutique_id)
+        errors = writer.validate(**serializer.validated_data)
+        if errors:
+            return Response({'results': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': writer.apply()}, status=status.HTTP_200_OK)
+
+
+class VendorCategoryListView(QueryPlanMixin, generics.ListCreateAPIView):
     """
     View to list and create categories for the authenticated vendor
     """
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CatalogCursorPagination
 
-    def get_queryset(self):
-        if hasattr(self.request.user, 'boutique'):
-            return Category.objects.filter(boutique=self.request.user.boutique)
+    def get_base_queryset(self):
+        boutique_id = get_boutique_id(self.request.user)
+        if boutique_id is not None:
+            return Category.objects.filter(boutique_id=boutique_id)
         return Category.objects.none()
 
     def perform_create(self, serializer):
-        if hasattr(self.request.user, 'boutique'):
-            serializer.save(boutique=self.request.user.boutique)
+        boutique_id = get_boutique_id(self.request.user)
+        if boutique_id is not None:
+            # Overrides any boutique sent by the client
+            serializer.save(boutique=Boutique(pk=boutique_id))
         else:
             raise serializers.ValidationError('Aucune boutique associée à cet utilisateur')
 
 
-class VendorCategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class VendorCategoryDetailView(QueryPlanMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     View to retrieve, update or delete a specific category for the authenticated vendor
     """
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated, IsVendorOwner]
 
-    def get_queryset(self):
-        if hasattr(self.request.user, 'boutique'):
-            return Category.objects.filter(boutique=self.request.user.boutique)
+    def get_base_queryset(self):
+        boutique_id = get_boutique_id(self.request.user)
+        if boutique_id is not None:
+            return Category.objects.filter(boutique_id=boutique_id)
         return Category.objects.none()
 
 
@@ -142,10 +220,15 @@ class ChangePasswordView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        user = request.user
         old_password = request.data.get('old_password')
         new_password = request.data.get('new_password')
 
+        # request.user may be a copy cached by another request, possibly
+        # before a password change or an admin edit made in another worker
+        user = VendorUser.objects.filter(pk=request.user.pk, is_active=True).first()
+        if user is None:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
         # Check if old password is correct
         if not user.check_password(old_password):
             return Response(
@@ -153,9 +236,10 @@ class ChangePasswordView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Set new password
+        # Set new password, without writing back the other columns
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=['password'])
+        invalidate_user_tokens(user.pk)
 
         return Response(
             {'message': 'Mot de passe modifié avec succès'},
@@ -164,16 +248,56 @@ class ChangePasswordView(APIView):
 
 
 # Public API views (for customers)
-class PublicProductListView(generics.ListAPIView):
+class PublicProductListView(QueryPlanMixin, generics.ListAPIView):
     """
-    Public view to list all products
+    Public view to list all products, filterable by boutique, category,
+    price range and stock, with facet counts for each filter
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = CatalogCursorPagination
+    filter_backends = [ProductFilterBackend, OrderingFilter]
+    ordering_fields = ['created_at', 'price']
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['facets'] = get_product_facets(parse_product_filters(request.query_params))
+        return response
+
+
+class PublicProductSearchView(QueryPlanMixin, generics.ListAPIView):
+    """
+    Public full-text product search (``?q=``) over titles, descriptions and
+    boutique names, best matches first. Words match as prefixes and accents
+    are ignored.
+    """
+    serializer_class = ProductSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def get_base_queryset(self):
+        return search_products(Product.objects.all(), self.request.query_params.get('q', ''))
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@renderer_classes([StreamingJSONRenderer, NDJSONRenderer])
+def public_product_export_view(request):
+    """
+    Public view streaming the whole product catalog, either as a JSON array
+    or as NDJSON (``?format=ndjson`` or ``Accept: application/x-ndjson``)
+    """
+    chunk_size = getattr(settings, 'SHOP_EXPORT_CHUNK_SIZE', 500)
+    selection = FieldSelection.from_request(request)
+    queryset = plan_queryset(Product.objects.order_by('id'), ProductSerializer, selection)
+    chunks = iter_serialized_chunks(queryset, ProductSerializer, chunk_size, selection)
 
+    renderer = request.accepted_renderer
+    return StreamingHttpResponse(renderer.render_stream(chunks), content_type=renderer.media_type)
 
-class PublicBoutiqueListView(generics.ListAPIView):
+
+class PublicBoutiqueListView(QueryPlanMixin, generics.ListAPIView):
     """
     Public view to list all boutiques
     """
@@ -182,7 +306,7 @@ class PublicBoutiqueListView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
 
 
-class PublicSliderListView(generics.ListAPIView):
+class PublicSliderListView(QueryPlanMixin, generics.ListAPIView):
     """
     Public view to list all sliders
     """
@@ -191,7 +315,7 @@ class PublicSliderListView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
 
 
-class PublicCompanyConfigView(generics.RetrieveAPIView):
+class PublicCompanyConfigView(QueryPlanMixin, generics.RetrieveAPIView):
     """
     Public view to get company config
     """
@@ -201,10 +325,11 @@ class PublicCompanyConfigView(generics.RetrieveAPIView):
     
     def get_object(self):
         # Return the first (and typically only) company config
-        return CompanyConfig.objects.first()
+        return self.get_queryset().first()
 
 
 @api_view(['GET'])
+@authentication_classes([])
 @permission_classes([AllowAny])
 def init_app_data_view(request):
     """
@@ -213,28 +338,101 @@ def init_app_data_view(request):
     - Sliders
     - Boutiques
     - Products
+
+    The payload is served from a pre-serialized snapshot that is rebuilt only
+    when the catalog version changes, and clients revalidating with
+    If-None-Match get a 304 without any database access.
     """
-    # Get company config (assuming there's only one for now)
-    company_config = CompanyConfig.objects.first()
-    company_serializer = CompanyConfigSerializer(company_config) if company_config else None
+    snapshot = get_init_app_data_snapshot()
 
-    # Get all sliders
-    sliders = Slider.objects.all()
-    slider_serializer = SliderSerializer(sliders, many=True)
+    if etag_matches(request, snapshot['etag']):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot['body'], content_type='application/json')
+    response['ETag'] = snapshot['etag']
+    response['Cache-Control'] = 'no-cache'
+    return response
 
-    # Get all boutiques with their associated products
-    boutiques = Boutique.objects.all()
-    boutique_serializer = BoutiqueSerializer(boutiques, many=True)
 
-    # Get all products
-    products = Product.objects.all()
-    product_serializer = ProductSerializer(products, many=True)
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def metrics_view(request):
+    """
+    Per-route request metrics of all the workers, in Prometheus text format
+    """
+    return HttpResponse(render_metrics(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
 
-    data = {
-        'company_config': company_serializer.data if company_serializer else None,
-        'sliders': slider_serializer.data,
-        'boutiques': boutique_serializer.data,
-        'products': product_serializer.data
-    }
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def sync_view(request):
+    """
+    Delta sync for the app: returns the catalog rows changed since the
+    ``since`` cursor, the ids deleted since then and the next cursor.
+    Without ``since`` the whole catalog is returned.
+    """
+    try:
+        data = build_changes(request.query_params.get('since'))
+    except InvalidCursor:
+        return Response({'error': 'Curseur de synchronisation invalide'}, status=status.HTTP_400_BAD_REQUEST)
     return Response(data)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def reserve_view(request):
+    """
+    Reserve the stock of a whole cart for the checkout. Either every line is
+    reserved or none is.
+    """
+    serializer = CartSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    items = [(item['product'], item['quantity']) for item in serializer.validated_data['items']]
+
+    try:
+        reservation = reserve_stock(items)
+    except InsufficientStock as exc:
+        return Response(
+            {'error': 'Stock insuffisant', 'product': exc.product_id},
+            status=status.HTTP_409_CONFLICT
+        )
+    reservation = plan_queryset(StockReservation.objects.filter(pk=reservation.pk), StockReservationSerializer).get()
+    return Response(StockReservationSerializer(reservation).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def quote_view(request):
+    """
+    Price a whole cart server side in one round trip: line and boutique
+    totals, stock availability and the pre-filled WhatsApp order message
+    """
+    serializer = CartSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    items = [(item['product'], item['quantity']) for item in serializer.validated_data['items']]
+    return Response(build_quote(items))
+
+
+@api_view(['DELETE'])
+@permission_classes([AllowAny])
+def reservation_cancel_view(request, token):
+    """
+    Cancel a reservation and give its stock back
+    """
+    reservation = StockReservation.objects.filter(token=token).only('pk').first()
+    if reservation is None or not release_reservation(reservation.pk):
+        return Response({'error': 'Réservation introuvable ou déjà clôturée'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def reservation_confirm_view(request, token):
+    """
+    Confirm a reservation once the order is placed, keeping the stock
+    """
+    reservation = StockReservation.objects.filter(token=token).only('pk').first()
+    if reservation is None or not confirm_reservation(reservation.pk):
+        return Response({'error': 'Réservation introuvable, expirée ou déjà clôturée'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'message': 'Réservation confirmée'}, status=status.HTTP_200_OK)